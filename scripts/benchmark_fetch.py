@@ -0,0 +1,114 @@
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+from helix_standin import SyntheticCatalog, start_standin_server
+
+# Benchmark de la phase de collecte (get_top_clips) et de la sélection, contre le serveur Helix local.
+# Pour chaque configuration : nombre de requêtes, temps de collecte (à froid puis incrémental)
+# et temps de sélection. Aucun identifiant Twitch n'est nécessaire.
+
+DEFAULT_CATALOG_SIZES = [10_000, 100_000, 1_000_000]
+DEFAULT_WORKER_COUNTS = [1, 8]
+DEFAULT_LATENCY_MS = 50
+
+def run_configuration(server, modules, catalog_size, workers, latency_ms, rate_limit_every, strategy, num_clips_per_source):
+    get_top_clips, clip_index, clip_selection, twitch_auth = modules
+    server.latency_ms = latency_ms
+    server.rate_limit_every = rate_limit_every
+
+    work_dir = tempfile.mkdtemp(prefix="bench_fetch_")
+    try:
+        # Index et jeton isolés : chaque configuration démarre à froid
+        clip_index.CLIP_INDEX_PATH = os.path.join(work_dir, "clip_index.sqlite3")
+        twitch_auth.TOKEN_CACHE_PATH = os.path.join(work_dir, "twitch_app_token.json")
+        twitch_auth._cached_token = None
+        get_top_clips.MAX_FETCH_WORKERS = workers
+        get_top_clips.HTTP_SESSION = get_top_clips.create_http_session(workers)
+
+        result = {
+            "catalog_size": catalog_size, "workers": workers, "latency_ms": latency_ms,
+            "rate_limit_every": rate_limit_every, "strategy": strategy,
+        }
+        for run in ("cold", "incremental"):
+            server.stats.reset()
+            get_top_clips.fetch_stats["split_windows"] = 0
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                candidates = get_top_clips.collect_candidate_clips(num_clips_per_source, profile_names=[get_top_clips.DEFAULT_PROFILE])
+            broadcaster_clips, game_clips = candidates[get_top_clips.DEFAULT_PROFILE]
+            result[f"{run}_fetch_seconds"] = round(time.perf_counter() - start, 3)
+            result[f"{run}_requests"] = server.stats.requests
+            result[f"{run}_rate_limited"] = server.stats.rate_limited
+            result[f"{run}_split_windows"] = get_top_clips.fetch_stats["split_windows"]
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            selected_clips, total_duration = clip_selection.select_clips(
+                broadcaster_clips, game_clips, strategy,
+                get_top_clips.MIN_VIDEO_DURATION_SECONDS, get_top_clips.MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION,
+                get_top_clips.MAX_TOTAL_CLIPS, get_top_clips.MAX_VIDEO_DURATION_SECONDS)
+        result["selection_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        result["candidates"] = len(broadcaster_clips) + len(game_clips)
+        result["selected_clips"] = len(selected_clips)
+        result["selected_duration"] = round(total_duration, 1)
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def print_report(results):
+    header = f"{'clips':>9} {'workers':>7} {'lat.ms':>6} {'429/N':>5} {'strategy':>9} | {'req':>5} {'split':>5} {'fetch s':>8} | {'req inc':>7} {'inc s':>7} | {'cand.':>6} {'sel ms':>8} {'sel':>4}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['catalog_size']:>9} {r['workers']:>7} {r['latency_ms']:>6g} {r['rate_limit_every']:>5} {r['strategy']:>9} | "
+              f"{r['cold_requests']:>5} {r['cold_split_windows']:>5} {r['cold_fetch_seconds']:>8.3f} | {r['incremental_requests']:>7} {r['incremental_fetch_seconds']:>7.3f} | "
+              f"{r['candidates']:>6} {r['selection_ms']:>8.2f} {r['selected_clips']:>4}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de la collecte Helix et de la sélection contre un serveur local.")
+    parser.add_argument("--catalog-sizes", type=int, nargs="+", default=DEFAULT_CATALOG_SIZES)
+    parser.add_argument("--workers", type=int, nargs="+", default=DEFAULT_WORKER_COUNTS)
+    parser.add_argument("--latency-ms", type=float, nargs="+", default=[DEFAULT_LATENCY_MS])
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Injecte un 429 toutes les N requêtes.")
+    parser.add_argument("--strategies", nargs="+", default=["classic"])
+    parser.add_argument("--clips-per-source", type=int, default=100)
+    parser.add_argument("--json", metavar="FICHIER", help="Écrit aussi les résultats en JSON.")
+    args = parser.parse_args()
+
+    server = start_standin_server()
+    # Les modules lisent ces variables à l'import : elles doivent être définies avant.
+    os.environ.setdefault("TWITCH_CLIENT_ID", "standin")
+    os.environ.setdefault("TWITCH_CLIENT_SECRET", "standin")
+    os.environ["TWITCH_API_BASE_URL"] = f"{server.base_url}/helix"
+    os.environ["TWITCH_AUTH_URL"] = f"{server.base_url}/oauth2/token"
+    import get_top_clips
+    import clip_index
+    import clip_selection
+    import twitch_auth
+    modules = (get_top_clips, clip_index, clip_selection, twitch_auth)
+
+    broadcaster_ids = list(dict.fromkeys(get_top_clips.BROADCASTER_IDS))
+    game_ids = list(dict.fromkeys(get_top_clips.GAME_IDS))
+    results = []
+    for catalog_size in args.catalog_sizes:
+        print(f"🧪 Génération d'un catalogue synthétique de {catalog_size} clips...", file=sys.stderr)
+        server.catalog = SyntheticCatalog(catalog_size, broadcaster_ids, game_ids)
+        for workers in args.workers:
+            for latency_ms in args.latency_ms:
+                for strategy in args.strategies:
+                    results.append(run_configuration(server, modules, catalog_size, workers, latency_ms,
+                                                     args.rate_limit_every, strategy, args.clips_per_source))
+                    print(f"  ✅ {catalog_size} clips, {workers} workers, {latency_ms:g} ms, {strategy}", file=sys.stderr)
+    server.shutdown()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
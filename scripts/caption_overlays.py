@@ -0,0 +1,69 @@
+import os
+import json
+import hashlib
+import threading
+from PIL import Image, ImageDraw, ImageFont
+
+# Légendes (titre, streamer, timecodes) rendues une seule fois en PNG transparent avec Pillow, puis superposées
+# par FFmpeg avec le filtre overlay : pas de rendu de texte à chaque frame ni d'échappement dans le graphe de filtres.
+# Les images sont mises en cache par texte, police et style (conservées entre les exécutions via le dossier .cache).
+CAPTION_CACHE_DIR = os.path.join(".cache", "captions")
+
+# À incrémenter si le rendu change sans que le texte, la police ou le style changent.
+CAPTION_RENDER_VERSION = 1
+
+FONT_PATHS = [
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", # Common on Linux
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",                 # Common on Linux
+    "/System/Library/Fonts/Supplemental/Arial.ttf",                    # macOS
+    "C:/Windows/Fonts/arial.ttf"                                       # Windows
+]
+
+_font_path = None
+
+def find_font_path():
+    """Police des légendes, ou "" pour la police par défaut de Pillow."""
+    global _font_path
+    if _font_path is None:
+        _font_path = next((path for path in FONT_PATHS if os.path.exists(path)), "")
+        if not _font_path:
+            print("⚠️ Aucune police TrueType trouvée pour les légendes. Utilisation de la police par défaut de Pillow.")
+    return _font_path
+
+def _load_font(font_path, font_size):
+    if font_path:
+        return ImageFont.truetype(font_path, font_size)
+    return ImageFont.load_default(font_size)
+
+def render_caption(lines, font_size=36, fill="white", stroke_fill="black", stroke_width=0, box_fill=None, padding=0, line_spacing=5):
+    """
+    Rend des lignes de texte centrées dans un PNG transparent (avec contour et/ou fond) et retourne son chemin.
+    L'image n'est rendue qu'une fois par combinaison texte / police / style.
+    """
+    font_path = find_font_path()
+    style = [CAPTION_RENDER_VERSION, lines, font_path, font_size, fill, stroke_fill, stroke_width, box_fill, padding, line_spacing]
+    digest = hashlib.sha256(json.dumps(style, ensure_ascii=False).encode("utf-8")).hexdigest()[:24]
+    path = os.path.join(CAPTION_CACHE_DIR, f"{digest}.png")
+    if os.path.exists(path):
+        return path
+
+    font = _load_font(font_path, font_size)
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    boxes = [measure.textbbox((0, 0), line, font=font, stroke_width=stroke_width) for line in lines]
+    line_heights = [bottom - top for _, top, _, bottom in boxes]
+    width = max(right - left for left, _, right, _ in boxes) + 2 * padding
+    height = sum(line_heights) + line_spacing * (len(lines) - 1) + 2 * padding
+
+    image = Image.new("RGBA", (max(width, 1), max(height, 1)), box_fill or (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    y = padding
+    for line, (left, top, right, _), line_height in zip(lines, boxes, line_heights):
+        x = (width - (right - left)) / 2 - left
+        draw.text((x, y - top), line, font=font, fill=fill, stroke_width=stroke_width, stroke_fill=stroke_fill)
+        y += line_height + line_spacing
+
+    os.makedirs(CAPTION_CACHE_DIR, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    image.save(temp_path, format="PNG")
+    os.replace(temp_path, path)
+    return path
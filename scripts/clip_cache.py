@@ -0,0 +1,186 @@
+import os
+import json
+import shutil
+import hashlib
+
+# Cache persistant des clips téléchargés (bruts) et prétraités, conservé entre les exécutions via le dossier .cache.
+# - raw/<clip_id>.<ext> : téléchargement brut, indépendant des paramètres de prétraitement ;
+# - processed/<clé>/ : clip prétraité, première frame et durée, la clé combinant l'ID du clip et une empreinte
+#   des paramètres FFmpeg (filtres, police, CRF, fps...). Modifier un paramètre invalide donc les entrées concernées ;
+# - segments/<empreinte>.mp4 : segment réencodé du rendu final (compile_video.py) ou clip avec son timecode
+#   (download_clips.py), adressé par son contenu (empreinte du clip, des légendes et des paramètres d'encodage).
+CLIP_CACHE_DIR = os.path.join(".cache", "clips")
+
+# Taille maximale du cache (octets) : au-delà, les entrées les moins récemment utilisées sont supprimées.
+CLIP_CACHE_MAX_BYTES = int(os.getenv("CLIP_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# À incrémenter si le contenu d'une entrée change sans que les paramètres FFmpeg changent.
+CLIP_CACHE_FORMAT_VERSION = 1
+
+PROCESSED_FILENAME = "processed.mp4"
+FIRST_FRAME_FILENAME = "first_frame.jpg"
+ENTRY_FILENAME = "entry.json"
+
+def _raw_dir():
+    return os.path.join(CLIP_CACHE_DIR, "raw")
+
+def _processed_dir(key):
+    return os.path.join(CLIP_CACHE_DIR, "processed", key)
+
+def cache_key(clip_id, params):
+    """Clé d'un clip prétraité : ID du clip + empreinte des paramètres de prétraitement."""
+    serialized = json.dumps([CLIP_CACHE_FORMAT_VERSION, params], sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:16]
+    return f"{clip_id}_{digest}"
+
+def _touch(path):
+    # La date de modification sert d'horodatage LRU
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def _link_or_copy(source, destination):
+    """Place `source` à `destination` par lien physique (sans copie), ou par copie si les deux ne partagent pas de système de fichiers."""
+    if os.path.lexists(destination):
+        os.remove(destination) # Jamais d'écriture à travers un lien existant : l'entrée du cache serait modifiée
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+def restore_raw(clip_id, destination_dir):
+    """Place le téléchargement brut en cache dans `destination_dir`. Retourne son chemin, ou None s'il n'est pas en cache."""
+    raw_dir = _raw_dir()
+    if not os.path.isdir(raw_dir):
+        return None
+    for filename in os.listdir(raw_dir):
+        if os.path.splitext(filename)[0] == clip_id:
+            cached_path = os.path.join(raw_dir, filename)
+            destination = os.path.join(destination_dir, filename)
+            try:
+                _link_or_copy(cached_path, destination)
+            except OSError:
+                return None
+            _touch(cached_path)
+            return destination
+    return None
+
+def store_raw(clip_id, raw_path):
+    """Ajoute un téléchargement brut au cache (sans erreur bloquante : le cache est facultatif)."""
+    os.makedirs(_raw_dir(), exist_ok=True)
+    extension = os.path.splitext(raw_path)[1]
+    try:
+        _link_or_copy(raw_path, os.path.join(_raw_dir(), f"{clip_id}{extension}"))
+    except OSError as e:
+        print(f"  ⚠️ Impossible de mettre en cache le clip brut {clip_id} : {e}")
+
+def restore_processed(key, processed_path, first_frame_path):
+    """
+    Place le clip prétraité et sa première frame en cache aux chemins donnés.
+    Retourne les informations enregistrées avec l'entrée (durée réelle...), ou None si elle est absente ou incomplète.
+    """
+    entry_dir = _processed_dir(key)
+    try:
+        with open(os.path.join(entry_dir, ENTRY_FILENAME), "r", encoding="utf-8") as f:
+            entry = json.load(f)
+        _link_or_copy(os.path.join(entry_dir, PROCESSED_FILENAME), processed_path)
+        _link_or_copy(os.path.join(entry_dir, FIRST_FRAME_FILENAME), first_frame_path)
+    except (OSError, ValueError):
+        return None
+    _touch(entry_dir)
+    return entry
+
+def store_processed(key, processed_path, first_frame_path, entry):
+    """Ajoute un clip prétraité au cache. L'entrée n'apparaît qu'une fois complète (renommage atomique du dossier)."""
+    entry_dir = _processed_dir(key)
+    temp_dir = f"{entry_dir}.tmp"
+    try:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+        _link_or_copy(processed_path, os.path.join(temp_dir, PROCESSED_FILENAME))
+        _link_or_copy(first_frame_path, os.path.join(temp_dir, FIRST_FRAME_FILENAME))
+        with open(os.path.join(temp_dir, ENTRY_FILENAME), "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(temp_dir, entry_dir)
+    except OSError as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        print(f"  ⚠️ Impossible de mettre en cache le clip prétraité {key} : {e}")
+
+def _segments_dir():
+    return os.path.join(CLIP_CACHE_DIR, "segments")
+
+def file_digest(path):
+    """Empreinte SHA-256 du contenu d'un fichier."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+def segment_key(params):
+    """Clé d'un segment : empreinte de ses entrées (contenus des fichiers) et paramètres de rendu."""
+    serialized = json.dumps([CLIP_CACHE_FORMAT_VERSION, params], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:32]
+
+def restore_segment(key, destination=None):
+    """
+    Chemin du segment en cache, ou None s'il n'est pas en cache. Avec `destination`, le segment y est placé (lien
+    physique ou copie) et ce chemin est retourné : il reste disponible même si l'entrée est retirée du cache.
+    """
+    path = os.path.join(_segments_dir(), f"{key}.mp4")
+    if not os.path.exists(path):
+        return None
+    _touch(path)
+    if destination is None:
+        return path
+    try:
+        _link_or_copy(path, destination)
+    except OSError:
+        return None
+    return destination
+
+def store_segment(key, rendered_path):
+    """Déplace un segment rendu dans le cache et retourne son nouveau chemin (l'original s'il ne peut pas être déplacé)."""
+    path = os.path.join(_segments_dir(), f"{key}.mp4")
+    try:
+        os.makedirs(_segments_dir(), exist_ok=True)
+        shutil.move(rendered_path, path)
+    except OSError as e:
+        print(f"  ⚠️ Impossible de mettre en cache le segment {key} : {e}")
+        return rendered_path
+    return path
+
+def _entry_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, filename)) for filename in os.listdir(path))
+    return os.path.getsize(path)
+
+def evict_clip_cache(max_bytes=None):
+    """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous la taille maximale du cache."""
+    max_bytes = CLIP_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    for parent in (_raw_dir(), os.path.join(CLIP_CACHE_DIR, "processed"), _segments_dir()):
+        if not os.path.isdir(parent):
+            continue
+        for name in os.listdir(parent):
+            path = os.path.join(parent, name)
+            if name.endswith(".tmp"):
+                shutil.rmtree(path, ignore_errors=True) # Entrée interrompue lors d'une exécution précédente
+                continue
+            try:
+                entries.append((os.path.getmtime(path), _entry_size(path), path))
+            except OSError:
+                continue
+    total_size = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+        total_size -= size
+        evicted += 1
+    if evicted:
+        print(f"🗑️ {evicted} entrées retirées du cache des clips (limite : {max_bytes / 1024 ** 2:.0f} Mo).")
+    return total_size
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+# Index local persistant des clips déjà collectés (conservé entre les exécutions via le dossier .cache).
+CLIP_INDEX_PATH = os.path.join(".cache", "clip_index.sqlite3")
+
+# Les clips créés avant cette limite sont supprimés de l'index (ils ne peuvent plus être sélectionnés).
+CLIP_INDEX_RETENTION_DAYS = 30
+
+# Champs collectés par get_top_clips.fetch_clips(), dans l'ordre des colonnes de la table.
+CLIP_FIELDS = (
+    "id", "url", "embed_url", "thumbnail_url", "title", "viewer_count",
+    "broadcaster_id", "broadcaster_name", "game_id", "game_name",
+    "created_at", "duration", "language"
+)
+
+HELIX_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clips (
+    id TEXT PRIMARY KEY,
+    url TEXT,
+    embed_url TEXT,
+    thumbnail_url TEXT,
+    title TEXT,
+    viewer_count INTEGER NOT NULL DEFAULT 0,
+    broadcaster_id TEXT,
+    broadcaster_name TEXT,
+    game_id TEXT,
+    game_name TEXT,
+    created_at TEXT,
+    duration REAL NOT NULL DEFAULT 0,
+    language TEXT,
+    published INTEGER NOT NULL DEFAULT 0,
+    unusable INTEGER NOT NULL DEFAULT 0,
+    last_seen_at TEXT
+);
+CREATE INDEX IF NOT EXISTS clips_by_language_created_at ON clips (language, created_at);
+CREATE TABLE IF NOT EXISTS fetch_watermarks (
+    source_type TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    language TEXT NOT NULL,
+    fetched_until TEXT NOT NULL,
+    PRIMARY KEY (source_type, source_id, language)
+);
+"""
+
+def format_helix_date(date):
+    return date.strftime(HELIX_DATE_FORMAT)
+
+def parse_helix_date(text):
+    return datetime.strptime(text, HELIX_DATE_FORMAT).replace(tzinfo=timezone.utc)
+
+def open_clip_index(path=None):
+    """Ouvre (et crée si besoin) l'index SQLite des clips."""
+    path = path or CLIP_INDEX_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(_SCHEMA)
+    # Index créé avant la colonne unusable
+    if "unusable" not in {row["name"] for row in connection.execute("PRAGMA table_info(clips)")}:
+        with connection:
+            connection.execute("ALTER TABLE clips ADD COLUMN unusable INTEGER NOT NULL DEFAULT 0")
+    return connection
+
+def prune_clip_index(connection, now):
+    """Supprime les clips trop anciens pour être encore sélectionnés."""
+    limit = now.timestamp() - CLIP_INDEX_RETENTION_DAYS * 86400
+    limit_str = format_helix_date(datetime.fromtimestamp(limit, timezone.utc))
+    with connection:
+        deleted = connection.execute("DELETE FROM clips WHERE created_at < ?", (limit_str,)).rowcount
+    if deleted:
+        print(f"🗑️ {deleted} clips de plus de {CLIP_INDEX_RETENTION_DAYS} jours retirés de l'index.")
+
+def get_watermarks(connection, language):
+    """Retourne {(source_type, source_id): datetime} jusqu'où chaque source a déjà été collectée."""
+    rows = connection.execute(
+        "SELECT source_type, source_id, fetched_until FROM fetch_watermarks WHERE language = ?", (language,)
+    )
+    return {(row["source_type"], row["source_id"]): parse_helix_date(row["fetched_until"]) for row in rows}
+
+def set_watermark(connection, source_type, source_id, language, fetched_until):
+    connection.execute(
+        "INSERT INTO fetch_watermarks (source_type, source_id, language, fetched_until) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (source_type, source_id, language) DO UPDATE SET fetched_until = excluded.fetched_until",
+        (source_type, source_id, language, format_helix_date(fetched_until))
+    )
+
+def upsert_clips(connection, clips, seen_at):
+    """
+    Ajoute les clips à l'index ou met à jour ceux déjà connus (vues, titre...).
+    Les drapeaux `published` et `unusable` d'un clip existant sont conservés.
+    """
+    columns = ", ".join(CLIP_FIELDS)
+    placeholders = ", ".join("?" for _ in CLIP_FIELDS)
+    updates = ", ".join(f"{field} = excluded.{field}" for field in CLIP_FIELDS if field != "id")
+    connection.executemany(
+        f"INSERT INTO clips ({columns}, last_seen_at) VALUES ({placeholders}, ?) "
+        f"ON CONFLICT (id) DO UPDATE SET {updates}, last_seen_at = excluded.last_seen_at",
+        [tuple(clip.get(field) for field in CLIP_FIELDS) + (format_helix_date(seen_at),) for clip in clips]
+    )
+
+def query_candidate_clips(connection, start_date, language, broadcaster_ids, game_ids):
+    """
+    Retourne (clips_des_streamers, clips_des_jeux) non publiés et utilisables créés depuis `start_date`, triés par vues.
+    Un clip d'un streamer listé est toujours rangé avec les streamers, même s'il a été trouvé via un jeu.
+    """
+    rows = connection.execute(
+        f"SELECT {', '.join(CLIP_FIELDS)} FROM clips "
+        "WHERE published = 0 AND unusable = 0 AND language = ? AND created_at >= ? ORDER BY viewer_count DESC",
+        (language, format_helix_date(start_date))
+    )
+    broadcaster_ids = set(broadcaster_ids)
+    game_ids = set(game_ids)
+    broadcaster_clips, game_clips = [], []
+    for row in rows:
+        clip = dict(row)
+        if clip["broadcaster_id"] in broadcaster_ids:
+            broadcaster_clips.append(clip)
+        elif clip["game_id"] in game_ids:
+            game_clips.append(clip)
+    return broadcaster_clips, game_clips
+
+def mark_clips_published(clip_ids, path=None):
+    """Marque des clips comme publiés : ils ne seront plus proposés par les prochaines sélections."""
+    connection = open_clip_index(path)
+    try:
+        with connection:
+            connection.executemany("UPDATE clips SET published = 1 WHERE id = ?", [(clip_id,) for clip_id in clip_ids])
+    finally:
+        connection.close()
+
+def mark_clips_unusable(clip_ids, path=None):
+    """Marque des clips comme inutilisables (abandonnés au téléchargement) : les prochaines sélections les remplacent."""
+    connection = open_clip_index(path)
+    try:
+        with connection:
+            connection.executemany("UPDATE clips SET unusable = 1 WHERE id = ?", [(clip_id,) for clip_id in clip_ids])
+    finally:
+        connection.close()
@@ -0,0 +1,142 @@
+import os
+import glob
+import json
+from dataclasses import dataclass, fields
+
+# Manifeste unique des clips de la compilation, partagé par toutes les étapes du pipeline
+# (get_top_clips → download_clips → compile_video → generate_metadata / generate_thumbnail → upload_youtube).
+# Format JSON Lines : une ligne d'en-tête versionnée, une ligne "select" par clip sélectionné, puis
+# chaque étape ajoute une ligne par clip avec uniquement les champs qu'elle produit.
+# Le fichier n'est jamais réécrit : le chargement rejoue les lignes dans l'ordre.
+MANIFEST_PATH = os.path.join("data", "clip_manifest.jsonl")
+MANIFEST_VERSION = 1
+
+# Chaque profil de compilation (voir COMPILATION_PROFILES dans get_top_clips.py) a son propre manifeste
+# et ses propres sorties ; le profil par défaut garde les chemins historiques.
+DEFAULT_PROFILE = "default"
+
+def profile_path(path, profile=DEFAULT_PROFILE):
+    """Chemin d'un fichier propre à un profil : inchangé pour le profil par défaut, suffixé sinon."""
+    if profile in (None, DEFAULT_PROFILE):
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}_{profile}{extension}"
+
+def manifest_path(profile=DEFAULT_PROFILE):
+    return profile_path(MANIFEST_PATH, profile)
+
+def list_manifest_profiles():
+    """Profils dont le manifeste existe dans le dossier de données."""
+    root, extension = os.path.splitext(MANIFEST_PATH)
+    profiles = []
+    for path in sorted(glob.glob(f"{root}*{extension}")):
+        suffix = path[len(root):-len(extension)]
+        if not suffix:
+            profiles.append(DEFAULT_PROFILE)
+        elif suffix.startswith("_"):
+            profiles.append(suffix[1:])
+    return profiles
+
+@dataclass(slots=True)
+class ClipRecord:
+    # Champs Helix (étape "select")
+    id: str
+    url: str = ""
+    embed_url: str = ""
+    thumbnail_url: str = ""
+    title: str = "Titre inconnu"
+    viewer_count: int = 0
+    broadcaster_id: str = ""
+    broadcaster_name: str = "Streamer inconnu"
+    game_id: str = ""
+    game_name: str = ""
+    created_at: str = ""
+    duration: float = 0.0 # Durée annoncée par Twitch
+    language: str = ""
+    # Champs ajoutés par les étapes suivantes
+    path: str = None # Clip prétraité (download_clips)
+    media_duration: float = 0.0 # Durée réelle du fichier prétraité (download_clips)
+    first_frame_path: str = None # Première frame, pour la miniature
+    passthrough: bool = False # Clip copié sans réencodage : titre et streamer incrustés au rendu final
+    timecode: str = None # Timecode incrusté au prétraitement (début du clip dans la compilation), None s'il est incrusté au rendu final
+    loudness: dict = None # Mesures de loudnorm au prétraitement (volume intégré d'origine, crête, plage...)
+    error: str = None # Dernière erreur de traitement du clip ("étape: message")
+
+    @classmethod
+    def from_dict(cls, data):
+        """Construit un enregistrement à partir d'un dict (clip Helix ou ligne du manifeste) ; les clés inconnues sont ignorées."""
+        if data.keys() <= RECORD_FIELDS:
+            return cls(**data)
+        return cls(**{key: value for key, value in data.items() if key in RECORD_FIELDS})
+
+    def to_dict(self):
+        """Champs renseignés uniquement (les valeurs None sont omises pour garder le manifeste compact)."""
+        return {name: value for name in RECORD_FIELD_NAMES if (value := getattr(self, name)) is not None}
+
+    @property
+    def is_ready(self):
+        """Le clip a été téléchargé et prétraité avec succès."""
+        return bool(self.path) and self.media_duration > 0
+
+RECORD_FIELD_NAMES = tuple(field.name for field in fields(ClipRecord))
+RECORD_FIELDS = frozenset(RECORD_FIELD_NAMES)
+
+def _dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def write_manifest(clips, path=None):
+    """Crée un nouveau manifeste (remplace l'éventuel précédent) avec les clips sélectionnés."""
+    path = path or MANIFEST_PATH
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    records = [clip if isinstance(clip, ClipRecord) else ClipRecord.from_dict(clip) for clip in clips]
+    lines = [_dumps({"manifest_version": MANIFEST_VERSION})]
+    lines += [_dumps({"stage": "select", **record.to_dict()}) for record in records]
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+    return records
+
+def append_stage(stage, updates, path=None):
+    """
+    Ajoute au manifeste les résultats d'une étape : `updates` est une liste de dicts contenant
+    l'`id` du clip et les seuls champs produits par l'étape. Une seule écriture, en fin de fichier.
+    """
+    if not updates:
+        return
+    lines = [_dumps({"stage": stage, **{key: value for key, value in update.items() if key in RECORD_FIELDS}}) for update in updates]
+    with open(path or MANIFEST_PATH, "a", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+def load_manifest(path=None):
+    """
+    Charge le manifeste et retourne les ClipRecord dans l'ordre de sélection, avec les champs
+    ajoutés par toutes les étapes déjà exécutées. Lève FileNotFoundError s'il n'existe pas.
+    """
+    records = {}
+    with open(path or MANIFEST_PATH, "r", encoding="utf-8") as f:
+        header = json.loads(f.readline() or "{}")
+        version = header.get("manifest_version")
+        if version is None or version > MANIFEST_VERSION:
+            raise ValueError(f"Version de manifeste non prise en charge : {version} (attendu : {MANIFEST_VERSION} au plus)")
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            stage = entry.pop("stage", None)
+            if stage == "select":
+                records[entry["id"]] = ClipRecord.from_dict(entry)
+                continue
+            record = records.get(entry.pop("id", None))
+            if record is None:
+                continue
+            for key, value in entry.items():
+                if key in RECORD_FIELDS:
+                    setattr(record, key, value)
+    return list(records.values())
+
+def load_ready_clips(path=None):
+    """Clips du manifeste téléchargés et prétraités avec succès, dans l'ordre de la compilation."""
+    return [record for record in load_manifest(path) if record.is_ready]
@@ -0,0 +1,179 @@
+import heapq
+
+# Nombre minimal de clips dans une compilation, même si la durée minimale est atteinte avant.
+MIN_CLIPS_IN_COMPILATION = 3
+
+# Stratégie "knapsack" : seuls les N clips les plus vus sont considérés, et l'exploration
+# branch-and-bound s'arrête (en gardant la meilleure solution trouvée) après ce nombre de nœuds.
+KNAPSACK_CANDIDATE_LIMIT = 200
+KNAPSACK_NODE_LIMIT = 200_000
+
+def _views(clip):
+    return clip.get("viewer_count", 0)
+
+def _duration(clip):
+    return float(clip.get("duration", 0.0))
+
+def greedy_select(candidate_groups, min_duration, max_per_broadcaster, max_total_clips, verbose=True):
+    """
+    Sélection gloutonne en une passe, en O(n log n) (un seul tri par groupe).
+    `candidate_groups` est une liste de (étiquette, clips) : chaque groupe est trié par vues puis
+    parcouru dans l'ordre de la liste, jusqu'à atteindre la durée minimale (et au moins
+    MIN_CLIPS_IN_COMPILATION clips) ou `max_total_clips` clips.
+    Retourne (clips_sélectionnés, durée_totale).
+    """
+    log = print if verbose else (lambda *args: None)
+    selected_clips = []
+    selected_ids = set()
+    clips_added_per_broadcaster = {}
+    total_duration = 0.0
+
+    for label, clips in candidate_groups:
+        for clip in sorted(clips, key=_views, reverse=True):
+            if total_duration >= min_duration and len(selected_clips) >= MIN_CLIPS_IN_COMPILATION:
+                log(f"  ✅ Durée minimale ({min_duration}s) atteinte avec {len(selected_clips)} clips.")
+                return selected_clips, total_duration
+            if len(selected_clips) >= max_total_clips:
+                log(f"  ⚠️ Nombre maximal de clips ({max_total_clips}) atteint.")
+                return selected_clips, total_duration
+            if clip["id"] in selected_ids:
+                continue
+
+            broadcaster_id = clip.get("broadcaster_id")
+            if clips_added_per_broadcaster.get(broadcaster_id, 0) >= max_per_broadcaster:
+                log(f"  [{label}] Ignoré : Limite de clips ({max_per_broadcaster}) atteinte pour {clip.get('broadcaster_name', 'N/A')}")
+                continue
+
+            clip_duration = _duration(clip)
+            if clip_duration <= 0:
+                continue
+            selected_clips.append(clip)
+            selected_ids.add(clip["id"])
+            total_duration += clip_duration
+            clips_added_per_broadcaster[broadcaster_id] = clips_added_per_broadcaster.get(broadcaster_id, 0) + 1
+            log(f"  [{label}] Ajouté : '{clip.get('title', 'N/A')}' par {clip.get('broadcaster_name', 'N/A')} ({clip_duration:.1f}s, Vues: {_views(clip)}). Durée cumulée: {total_duration:.1f}s. Clips de ce streamer: {clips_added_per_broadcaster[broadcaster_id]}/{max_per_broadcaster}")
+
+    if total_duration >= min_duration and len(selected_clips) >= MIN_CLIPS_IN_COMPILATION:
+        log(f"  ✅ Durée minimale ({min_duration}s) atteinte avec {len(selected_clips)} clips.")
+    return selected_clips, total_duration
+
+def knapsack_select(candidate_groups, min_duration, max_per_broadcaster, max_total_clips, max_duration):
+    """
+    Maximise le total des vues sous contraintes : durée totale entre `min_duration` et `max_duration`,
+    au plus `max_per_broadcaster` clips par streamer et `max_total_clips` clips au total.
+    Branch-and-bound (clips triés par vues/seconde) initialisé avec la solution gloutonne ;
+    les groupes sont fusionnés (pas de priorité stricte des streamers).
+    Retourne (clips_sélectionnés triés par vues, durée_totale).
+    """
+    unique_clips = {}
+    for _, clips in candidate_groups:
+        for clip in clips:
+            if _duration(clip) > 0:
+                unique_clips.setdefault(clip["id"], clip)
+    pool = heapq.nlargest(KNAPSACK_CANDIDATE_LIMIT, unique_clips.values(), key=_views)
+    items = sorted(pool, key=lambda clip: _views(clip) / _duration(clip), reverse=True)
+    views = [_views(clip) for clip in items]
+    durations = [_duration(clip) for clip in items]
+    broadcasters = [clip.get("broadcaster_id") for clip in items]
+    item_count = len(items)
+
+    # Première solution initiale : la sélection gloutonne classique, si elle respecte la durée maximale.
+    greedy_clips, greedy_duration = greedy_select([("KNAPSACK", pool)], min_duration, max_per_broadcaster, max_total_clips, verbose=False)
+    best = {"value": -1, "indexes": None}
+    if min_duration <= greedy_duration <= max_duration:
+        greedy_ids = {clip["id"] for clip in greedy_clips}
+        best["indexes"] = [i for i, clip in enumerate(items) if clip["id"] in greedy_ids]
+        best["value"] = sum(views[i] for i in best["indexes"])
+
+    # Autres solutions initiales : remplissage jusqu'à la durée maximale, par vues puis par vues/seconde.
+    def fill(order):
+        indexes, duration, counts = [], 0.0, {}
+        for i in order:
+            if len(indexes) >= max_total_clips:
+                break
+            if duration + durations[i] <= max_duration and counts.get(broadcasters[i], 0) < max_per_broadcaster:
+                indexes.append(i)
+                duration += durations[i]
+                counts[broadcasters[i]] = counts.get(broadcasters[i], 0) + 1
+        return indexes, duration
+
+    for order in (sorted(range(item_count), key=views.__getitem__, reverse=True), range(item_count)):
+        indexes, duration = fill(order)
+        value = sum(views[i] for i in indexes)
+        if duration >= min_duration and len(indexes) >= MIN_CLIPS_IN_COMPILATION and value > best["value"]:
+            best["value"] = value
+            best["indexes"] = indexes
+
+    def upper_bound(start, value, duration, count):
+        # Relaxation fractionnaire sur la durée restante (sans limite de nombre de clips)...
+        capacity_left = max_duration - duration
+        fractional_bound = value
+        for j in range(start, item_count):
+            if durations[j] <= capacity_left:
+                fractional_bound += views[j]
+                capacity_left -= durations[j]
+            else:
+                fractional_bound += views[j] * capacity_left / durations[j]
+                break
+        # ... et meilleurs clips restants dans la limite de clips (sans contrainte de durée).
+        slots_bound = value + sum(heapq.nlargest(max_total_clips - count, views[start:]))
+        return min(fractional_bound, slots_bound)
+
+    chosen = []
+    clips_per_broadcaster = {}
+    nodes = [0]
+
+    def explore(index, value, duration):
+        nodes[0] += 1
+        if nodes[0] > KNAPSACK_NODE_LIMIT:
+            return
+        if duration >= min_duration and len(chosen) >= MIN_CLIPS_IN_COMPILATION and value > best["value"]:
+            best["value"] = value
+            best["indexes"] = list(chosen)
+        if index == item_count or len(chosen) >= max_total_clips:
+            return
+        if upper_bound(index, value, duration, len(chosen)) <= best["value"]:
+            return
+        broadcaster_id = broadcasters[index]
+        if duration + durations[index] <= max_duration and clips_per_broadcaster.get(broadcaster_id, 0) < max_per_broadcaster:
+            chosen.append(index)
+            clips_per_broadcaster[broadcaster_id] = clips_per_broadcaster.get(broadcaster_id, 0) + 1
+            explore(index + 1, value + views[index], duration + durations[index])
+            clips_per_broadcaster[broadcaster_id] -= 1
+            chosen.pop()
+        explore(index + 1, value, duration)
+
+    print(f"  [KNAPSACK] Optimisation sur {item_count} clips candidats (durée visée : {min_duration}s à {max_duration}s)...")
+    explore(0, 0, 0.0)
+    if nodes[0] > KNAPSACK_NODE_LIMIT:
+        print(f"  ⚠️ [KNAPSACK] Limite de {KNAPSACK_NODE_LIMIT} nœuds atteinte : meilleure solution trouvée conservée.")
+
+    if best["indexes"] is None:
+        print("  ⚠️ [KNAPSACK] Aucune combinaison ne respecte les contraintes de durée. Sélection gloutonne conservée.")
+        return greedy_clips, greedy_duration
+
+    selected_clips = sorted((items[i] for i in best["indexes"]), key=_views, reverse=True)
+    total_duration = sum(durations[i] for i in best["indexes"])
+    print(f"  ✅ [KNAPSACK] {len(selected_clips)} clips, {best['value']} vues au total, durée {total_duration:.1f}s.")
+    return selected_clips, total_duration
+
+SELECTION_STRATEGIES = ("priority", "classic", "knapsack")
+
+def select_clips(broadcaster_clips, game_clips, strategy, min_duration, max_per_broadcaster, max_total_clips, max_duration):
+    """
+    Point d'entrée unique de la sélection des clips d'une compilation.
+    - "priority" : clips des streamers d'abord, puis clips des jeux pour compléter la durée ;
+    - "classic" : tous les clips triés globalement par vues ;
+    - "knapsack" : maximise le total des vues dans la fenêtre de durée [min_duration, max_duration].
+    Retourne (clips_sélectionnés, durée_totale).
+    """
+    if strategy == "priority":
+        print(f"\nMode de sélection: PRIORITAIRE (streamers d'abord). Atteindre {min_duration}s.")
+        return greedy_select([("PRIO", broadcaster_clips), ("JEUX", game_clips)], min_duration, max_per_broadcaster, max_total_clips)
+    if strategy == "classic":
+        print(f"\nMode de sélection: CLASSIQUE (tous les clips triés par vues). Atteindre {min_duration}s.")
+        return greedy_select([("GLOBAL", broadcaster_clips + game_clips)], min_duration, max_per_broadcaster, max_total_clips)
+    if strategy == "knapsack":
+        print(f"\nMode de sélection: KNAPSACK (maximisation des vues). Atteindre {min_duration}s sans dépasser {max_duration}s.")
+        return knapsack_select([("KNAPSACK", broadcaster_clips + game_clips)], min_duration, max_per_broadcaster, max_total_clips, max_duration)
+    raise ValueError(f"Stratégie de sélection inconnue : {strategy} (attendu : {', '.join(SELECTION_STRATEGIES)})")
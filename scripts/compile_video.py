@@ -1,36 +1,26 @@
 import subprocess
 import os
-import json
 import sys
+import time
+import argparse
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from ffmpeg_runner import FFMPEG_THREAD_BUDGET, run_job, summarize_jobs
+from run_report import add_metrics, stage_report
+from clip_manifest import DEFAULT_PROFILE, manifest_path, profile_path, load_ready_clips
+import clip_cache
+from download_clips import (CLIP_CAPTION_POSITION, TIMECODE_CAPTION_POSITION, TIMECODE_DISPLAY_SECONDS, VIDEO_OUTPUT_ARGS,
+                            format_duration, render_clip_caption, render_timecode_caption)
 
 # --- Chemins des fichiers ---
-INPUT_PATHS_JSON = os.path.join("data", "downloaded_clip_paths.json")
 OUTPUT_VIDEO_PATH = os.path.join("output", "compiled_video.mp4")
-CLIPS_LIST_TXT = os.path.join("data", "clips_list.txt") # Utilisé pour concaténation initiale
-
-# --- Chemins pour les frames des vignettes ---
-THUMBNAIL_FRAMES_DIR = os.path.join("data", "thumbnail_frames") # Nouveau dossier pour stocker les frames
-
-# --- PARAMÈTRES FFmpeg ---
-# ... (votre code existant pour FONT_PATH_FFMPEG et get_ffmpeg_font_path())
-# Obtenir le chemin de la police pour FFmpeg (comme défini précédemment)
-def get_ffmpeg_font_path():
-    """Tente de trouver un chemin de police fiable pour FFmpeg."""
-    font_paths = [
-        "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", # Common on Linux
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Regular.ttf",        # Common on Linux
-        "/System/Library/Fonts/Supplemental/Arial.ttf",                  # macOS
-        "C:/Windows/Fonts/arial.ttf"                                     # Windows
-    ]
-    for path in font_paths:
-        if os.path.exists(path):
-            print(f"✅ Police trouvée et utilisée pour FFmpeg: {path}")
-            return path
-    print("⚠️ Aucune police TrueType spécifique trouvée. Utilisation d'une police générique 'sans-serif'.")
-    return "sans-serif" # Fallback to generic font family name for FFmpeg
+SEGMENTS_LIST_TXT = os.path.join("output", "segments_list.txt") # Liste du démuxeur concat
 
-FONT_PATH_FFMPEG = get_ffmpeg_font_path()
+# Segments réencodés (clips en passthrough, timecodes non incrustés au prétraitement) : encodés en parallèle,
+# chacun avec une part des threads du budget FFmpeg. Plusieurs encodages x264 de quelques threads exploitent mieux
+# les cœurs qu'un seul encodage de toute la compilation.
+RENDER_THREADS_PER_SEGMENT = 4
 
 # --- NOUVEAU PARAMÈTRE : Limite le nombre total de clips dans la compilation finale ---
 MAX_TOTAL_CLIPS = 30
@@ -38,98 +28,68 @@ MAX_TOTAL_CLIPS = 30
 # Obtenir le répertoire racine du dépôt (où se trouve .github/)
 REPO_ROOT = os.getcwd() 
 
-def format_duration(seconds):
-    """Formate une durée en secondes en HH:MM:SS."""
-    if seconds < 0:
-        seconds = 0
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    seconds = int(seconds % 60)
-    return f"{hours:02}:{minutes:02}:{seconds:02}"
-
-def extract_first_frame(video_path, output_image_path):
-    """Extrait la première frame d'une vidéo et la sauvegarde comme image."""
-    output_dir = os.path.dirname(output_image_path)
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
-        print(f"Dossier pour les frames de vignette créé : {output_dir}")
+def segment_cache_key(clip_info, overlays):
+    """Clé du segment d'un clip : contenu du clip prétraité, légendes (images et fenêtres) et paramètres d'encodage."""
+    return clip_cache.segment_key([
+        clip_cache.file_digest(clip_info.path),
+        [(clip_cache.file_digest(image), position, start, end) for image, position, start, end in overlays],
+        VIDEO_OUTPUT_ARGS,
+    ])
+
+def encode_segment(clip_info, overlays, output_path, index):
+    """
+    Encode le segment d'un clip avec ses légendes (fenêtres relatives au début du clip, fin None : tout le clip).
+    La vidéo est réencodée avec les paramètres du prétraitement et l'audio, déjà normalisé, est copié. Retourne le JobRecord.
+    """
+    # Entrées : le clip, puis une image par légende
+    filters = ["[0:v]setpts=PTS-STARTPTS[c0]"]
+    label = "c0"
+    for k, (_, position, start, end) in enumerate(overlays, start=1):
+        enable = f":enable='between(t,{start:.3f},{end:.3f})'" if end is not None else ""
+        filters.append(f"[{label}][{k}:v]overlay={position}{enable}[c{k}]")
+        label = f"c{k}"
+    filters.append(f"[{label}]fps=30[vout]")
 
     command = [
         "ffmpeg",
-        "-i", video_path,
-        "-vf", "select='eq(n,0)'", # Sélectionne la première frame
-        "-vsync", "vfr",
-        "-q:v", "2", # Qualité élevée pour l'image
+        "-i", os.path.abspath(clip_info.path),
+        *[arg for image, _, _, _ in overlays for arg in ("-i", image)],
+        "-filter_complex", ";".join(filters),
+        "-map", "[vout]",
+        "-map", "0:a:0?",
+        *VIDEO_OUTPUT_ARGS,
+        "-c:a", "copy",
+        "-threads", str(RENDER_THREADS_PER_SEGMENT),
         "-y",
-        output_image_path
+        output_path
     ]
-    print(f"Extraction de la première frame de {os.path.basename(video_path)}: {' '.join(command)}")
-    try:
-        # Utiliser capture_output=True pour voir les erreurs de FFmpeg
-        subprocess.run(command, check=True, capture_output=True, text=True)
-        print(f"✅ Première frame extraite et sauvegardée : {output_image_path}")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Erreur lors de l'extraction de la frame de {video_path}: {e.stderr}")
-        return False
-    except Exception as e:
-        print(f"❌ Erreur inattendue lors de l'extraction de la frame de {video_path}: {e}")
-        return False
+    return run_job(command, threads=RENDER_THREADS_PER_SEGMENT, label=f"segment {index + 1} ({clip_info.id})")
 
-def compile_video():
-    print("🎬 Démarrage de la compilation des clips vidéo avec timecodes...")
+def compile_video(profile=DEFAULT_PROFILE):
+    print(f"🎬 Démarrage de la compilation des clips vidéo avec timecodes (profil {profile})...")
+    # Sorties propres au profil : plusieurs compilations peuvent être rendues à partir des mêmes clips
+    output_video_path = profile_path(OUTPUT_VIDEO_PATH, profile)
+    clips_manifest_path = manifest_path(profile)
 
-    output_dir = os.path.dirname(OUTPUT_VIDEO_PATH)
+    output_dir = os.path.dirname(output_video_path)
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
         print(f"Dossier de sortie créé : {output_dir}")
         
-    if not os.path.exists(INPUT_PATHS_JSON):
-        print(f"❌ Fichier des chemins de clips téléchargés '{INPUT_PATHS_JSON}' introuvable.")
+    if not os.path.exists(clips_manifest_path):
+        print(f"❌ Manifeste des clips '{clips_manifest_path}' introuvable.")
         sys.exit(1)
 
-    # Lire les informations des clips téléchargés et prétraités (incluant la durée réelle)
-    with open(INPUT_PATHS_JSON, "r") as f:
-        downloaded_clip_info = json.load(f)
+    # Lire les clips téléchargés et prétraités (incluant la durée réelle) depuis le manifeste
+    downloaded_clip_info = load_ready_clips(clips_manifest_path)
 
     if not downloaded_clip_info:
         print("⚠️ Aucune information de vidéo téléchargée à compiler. Fin de l'étape de compilation.")
         sys.exit(0)
 
-    # Filtrer et limiter les clips à traiter
-    final_clips_to_process = []
-    # Créer une liste temporaire pour collecter les informations mises à jour
-    updated_downloaded_clip_info = []
-
-    for clip_data in downloaded_clip_info:
-        if clip_data.get("path") and clip_data.get("duration", 0.0) > 0:
-            final_clips_to_process.append(clip_data)
-        if len(final_clips_to_process) >= MAX_TOTAL_CLIPS:
-            break
-
-    # NOUVELLE LOGIQUE : Extraire la première frame pour les vignettes
-    print("\n🖼️ Extraction des premières frames des clips pour la miniature...")
-    for clip_info in final_clips_to_process:
-        clip_id = clip_info['id'] # Supposons que chaque clip a un ID
-        clip_path = clip_info['path']
-        frame_output_path = os.path.join(THUMBNAIL_FRAMES_DIR, f"{clip_id}_first_frame.jpg")
-        
-        if extract_first_frame(clip_path, frame_output_path):
-            # Mettre à jour l'information du clip avec le chemin de la frame
-            clip_info['first_frame_path'] = frame_output_path
-        else:
-            print(f"⚠️ Impossible d'extraire la frame pour le clip {clip_id}. La miniature pourrait être affectée.")
-            # Optionnel: Supprimer le clip de final_clips_to_process si la frame est critique
-            # Ou simplement ne pas ajouter 'first_frame_path' si l'extraction échoue
-
-        # Ajouter l'info du clip (modifiée ou non) à la liste mise à jour
-        updated_downloaded_clip_info.append(clip_info)
-    
-    # Écrire les informations de clips mises à jour (avec les chemins des frames)
-    with open(INPUT_PATHS_JSON, "w", encoding="utf-8") as f:
-        json.dump(updated_downloaded_clip_info, f, ensure_ascii=False, indent=2)
-    print("✅ Chemins des frames ajoutés à downloaded_clip_paths.json.")
-
+    # Limiter les clips à traiter
+    # (la première frame de chaque clip, pour la miniature, est déjà produite par download_clips.py)
+    final_clips_to_process = downloaded_clip_info[:MAX_TOTAL_CLIPS]
 
     if not final_clips_to_process:
         print("⚠️ Après application des filtres et limites, aucune vidéo à compiler. Fin de l'étape.")
@@ -137,127 +97,105 @@ def compile_video():
 
     print(f"Compilation de {len(final_clips_to_process)} clips (max {MAX_TOTAL_CLIPS} clips).")
 
-    # --- Étape 1: Concaténation initiale (rapide) sans réencodage ---
-    # ... (Le reste de votre code existant pour la concaténation vidéo et audio)
-    temp_concat_video_path = os.path.join(output_dir, "temp_concat_video_no_audio.mp4")
-    temp_concat_audio_path = os.path.join(output_dir, "temp_concat_audio.aac")
-
-    # Crée le fichier de liste pour la concaténation
-    with open(CLIPS_LIST_TXT, "w") as f:
-        for clip_info in final_clips_to_process:
-            absolute_clip_path = os.path.abspath(clip_info['path'])
-            f.write(f"file '{absolute_clip_path}'\n")
-
-    concat_video_command = [
-        "ffmpeg",
-        "-f", "concat",
-        "-safe", "0",
-        "-i", CLIPS_LIST_TXT,
-        "-c:v", "copy",
-        "-an",
-        "-y",
-        temp_concat_video_path
-    ]
-    print(f"Exécution de la commande FFmpeg (concaténation vidéo initiale sans audio): {' '.join(concat_video_command)}")
-    try:
-        subprocess.run(concat_video_command, check=True, capture_output=True, text=True)
-        print("✅ Concaténation vidéo initiale terminée.")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Erreur lors de la concaténation vidéo initiale : {e.stderr}")
-        sys.exit(1)
-
-    # --- Étape 2: Concaténation et Normalisation Audio ---
-    audio_inputs_cmd = []
-    for clip_info in final_clips_to_process:
-        absolute_clip_path = os.path.abspath(clip_info['path'])
-        audio_inputs_cmd.extend(["-i", absolute_clip_path])
-        
-    audio_filter_complex = ""
-    if len(final_clips_to_process) > 1:
-        audio_filter_complex = "".join([f"[{i}:a]" for i in range(len(final_clips_to_process))])
-        audio_filter_complex += f"concat=n={len(final_clips_to_process)}:v=0:a=1[aout];[aout]loudnorm=I=-16:TP=-1.5:LRA=11"
-    else:
-        audio_filter_complex = "[0:a]loudnorm=I=-16:TP=-1.5:LRA=11"
-
-    audio_command = [
-        "ffmpeg",
-        *audio_inputs_cmd,
-        "-filter_complex", audio_filter_complex,
-        "-c:a", "aac",
-        "-b:a", "192k",
-        "-ac", "2",
-        "-ar", "44100",
-        "-vn",
-        "-y",
-        temp_concat_audio_path
-    ]
-
-    print(f"\nExécution de la commande FFmpeg (extraction, concaténation et normalisation audio): {' '.join(audio_command)}")
-    try:
-        subprocess.run(audio_command, check=True, capture_output=True, text=True)
-        print("✅ Audio combiné et normalisé avec succès.")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Erreur lors du traitement audio : {e.stderr}")
-        sys.exit(1)
+    # L'audio de chaque clip a été normalisé au prétraitement (loudnorm, download_clips.py) : il est concaténé
+    # sans décodage ni réencodage.
+    not_normalized = [clip_info.id for clip_info in final_clips_to_process if not clip_info.loudness]
+    if not_normalized:
+        print(f"⚠️ Audio sans mesure de volume (prétraitement antérieur ou clip sans audio) : {', '.join(not_normalized)}")
 
-    # --- Étape 3: Application des timecodes sur la vidéo concaténée et fusion avec l'audio ---
-    drawtext_filters = []
+    timecodes = []
     current_offset = 0.0
     for clip_info in final_clips_to_process:
-        start_time_str = format_duration(current_offset)
-        clip_duration = clip_info.get('duration', 0.0) 
-        
-        text_content = f"{start_time_str} - {clip_info['title']} par {clip_info['broadcaster_name']}"
-        escaped_text = text_content.replace("'", "'\\''") 
-        
-        drawtext_filters.append(
-            f"drawtext="
-            f"fontfile='{FONT_PATH_FFMPEG}':"
-            f"text='{escaped_text}':"
-            f"x=(w-text_w)/2:"
-            f"y=h-th-20:"
-            f"fontsize=36:"
-            f"fontcolor=white:"
-            f"box=1:"
-            f"boxcolor=black@0.6:"
-            f"enable='between(t,{current_offset},{current_offset + min(clip_duration, 5)})'"
-        )
-        current_offset += clip_duration
-
-    video_filter_complex = ",".join(drawtext_filters)
+        timecodes.append(format_duration(current_offset))
+        current_offset += clip_info.media_duration
+    misplaced = [clip_info.id for clip_info, timecode in zip(final_clips_to_process, timecodes) if clip_info.timecode not in (None, timecode)]
+    if misplaced:
+        print(f"⚠️ Timecode incrusté différent de la position réelle pour {len(misplaced)} clip(s) : {', '.join(misplaced)}")
+
+    # --- Étape 1: Segments de la compilation ---
+    # Un clip dont le titre et le timecode ont été incrustés par download_clips.py (BURN_TIMECODES) est
+    # utilisé tel quel. Les autres (clips en passthrough, timecode non incrusté) sont réencodés avec leurs légendes
+    # (PNG pré-rendus, caption_overlays.py) ; ces segments sont conservés dans le cache des clips, adressés par leur
+    # contenu : une recompilation ne réencode que les segments qui ont changé.
+    clip_count = len(final_clips_to_process)
+    segment_paths = [None] * clip_count
+    to_render = [] # (indice, légendes, clé)
+    for k, (clip_info, timecode) in enumerate(zip(final_clips_to_process, timecodes)):
+        overlays = [] # (image, position, début, fin), temps relatifs au début du clip (fin None : tout le clip)
+        if clip_info.passthrough:
+            overlays.append((render_clip_caption(clip_info), CLIP_CAPTION_POSITION, 0.0, None))
+        if not clip_info.timecode:
+            overlays.append((render_timecode_caption(clip_info, timecode), TIMECODE_CAPTION_POSITION,
+                             0.0, min(clip_info.media_duration, TIMECODE_DISPLAY_SECONDS)))
+        if not overlays:
+            segment_paths[k] = clip_info.path
+            continue
+        key = segment_cache_key(clip_info, overlays)
+        segment_paths[k] = clip_cache.restore_segment(key)
+        if not segment_paths[k]:
+            to_render.append((k, overlays, key))
+    reencoded_count = sum(1 for clip_info, path in zip(final_clips_to_process, segment_paths) if path != clip_info.path)
+    render_mode = "copy" if not reencoded_count else "filter"
+    print(f"Segments : {clip_count - reencoded_count} clips utilisés tels quels, {reencoded_count - len(to_render)} segments en cache, {len(to_render)} à encoder.")
 
-    final_command = [
-        "ffmpeg",
-        "-i", temp_concat_video_path,
-        "-i", temp_concat_audio_path,
-        "-filter_complex", video_filter_complex,
-        "-c:v", "libx264",
-        "-preset", "medium",
-        "-crf", "23",
-        "-map", "0:v:0",
-        "-map", "1:a:0",
-        "-y",
-        OUTPUT_VIDEO_PATH
-    ]
-    
-    print(f"\nExécution de la commande FFmpeg (ajout timecodes et fusion finale): {' '.join(final_command)}")
     try:
-        process = subprocess.run(final_command, check=True, capture_output=True, text=True)
-        print(f"✅ Compilation vidéo finale terminée avec timecodes: {OUTPUT_VIDEO_PATH}")
-        if process.stdout: print("FFmpeg STDOUT (final):\n", process.stdout)
-        if process.stderr: print("FFmpeg STDERR (final):\n", process.stderr)
+        render_start = time.perf_counter()
+        segment_jobs = []
+        if to_render:
+            print(f"\nEncodage de {len(to_render)} segment(s) en parallèle ({RENDER_THREADS_PER_SEGMENT} threads FFmpeg chacun)...")
+            with ThreadPoolExecutor(max_workers=max(1, FFMPEG_THREAD_BUDGET // RENDER_THREADS_PER_SEGMENT)) as pool:
+                futures = []
+                for k, overlays, key in to_render:
+                    rendered_path = profile_path(os.path.join(output_dir, f"temp_segment_{k:03}.mp4"), profile)
+                    futures.append((k, key, rendered_path, pool.submit(encode_segment, final_clips_to_process[k], overlays, rendered_path, k)))
+                for k, key, rendered_path, future in futures:
+                    segment_jobs.append(future.result())
+                    segment_paths[k] = clip_cache.store_segment(key, rendered_path)
+            print(f"✅ Segments encodés : {sum(job.out_time for job in segment_jobs):.1f}s de vidéo, CPU {sum(job.cpu_seconds or 0 for job in segment_jobs):.1f}s.")
+
+        # --- Étape 2: Concaténation des segments (vidéo et audio) sans réencodage ---
+        segments_list_path = profile_path(SEGMENTS_LIST_TXT, profile)
+        with open(segments_list_path, "w", encoding="utf-8") as f:
+            for segment_path in segment_paths:
+                absolute_segment_path = os.path.abspath(segment_path).replace("'", "'\\''")
+                f.write(f"file '{absolute_segment_path}'\n")
+        final_command = [
+            "ffmpeg",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", segments_list_path,
+            "-map", "0:v:0",
+            "-map", "0:a:0",
+            "-c", "copy",
+            "-movflags", "+faststart",
+            "-y",
+            output_video_path
+        ]
+
+        print(f"\nExécution de la commande FFmpeg (fusion finale sans réencodage): {' '.join(final_command)}")
+        job = run_job(final_command, label="rendu final")
+        render_seconds = time.perf_counter() - render_start
+        peak_rss_mb = max(record.peak_rss_mb or 0 for record in [job, *segment_jobs])
+        print(f"✅ Compilation vidéo finale terminée avec timecodes: {output_video_path}")
+        print(f"   {job.out_time:.1f}s de vidéo en {render_seconds:.1f}s (x{job.out_time / render_seconds if render_seconds else 0:.2f}), RSS max {peak_rss_mb:.0f} Mo.")
+        if job.stderr_tail: print("FFmpeg STDERR (final):\n", job.stderr_tail)
+        summarize_jobs()
+        add_metrics(
+            clips_processed=clip_count,
+            render_mode=render_mode,
+            render_segments=len(segment_jobs),
+            segment_cache_hits=reencoded_count - len(to_render),
+            bytes_read=sum(os.path.getsize(path) for path in segment_paths if os.path.exists(path)),
+            bytes_written=os.path.getsize(output_video_path),
+            output_duration_seconds=round(job.out_time, 3),
+            encode_seconds=round(render_seconds, 3),
+            encode_speed=round(job.out_time / render_seconds, 2) if render_seconds else None,
+            peak_rss_mb=round(peak_rss_mb, 1) if peak_rss_mb else None,
+        )
 
-        # Nettoyage des fichiers temporaires et des frames de vignette
-        os.remove(temp_concat_video_path)
-        os.remove(temp_concat_audio_path)
-        os.remove(CLIPS_LIST_TXT)
-        
-        # Supprimer les frames de vignette après usage (ou les garder si tu veux les inspecter)
-        # for clip_info in updated_downloaded_clip_info:
-        #     if 'first_frame_path' in clip_info and os.path.exists(clip_info['first_frame_path']):
-        #         os.remove(clip_info['first_frame_path'])
-        # if os.path.exists(THUMBNAIL_FRAMES_DIR) and not os.listdir(THUMBNAIL_FRAMES_DIR): # Supprime le dossier s'il est vide
-        #     os.rmdir(THUMBNAIL_FRAMES_DIR)
+        # Nettoyage des fichiers temporaires
+        os.remove(segments_list_path)
+        clip_cache.evict_clip_cache()
 
         print("✅ Fichiers temporaires nettoyés.")
 
@@ -269,4 +207,8 @@ def compile_video():
         sys.exit(1)
 
 if __name__ == "__main__":
-    compile_video()
+    parser = argparse.ArgumentParser(description="Compile les clips d'un profil en une vidéo.")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="Profil de compilation (voir COMPILATION_PROFILES dans get_top_clips.py).")
+    args = parser.parse_args()
+    with stage_report("compile_video", args.profile):
+        compile_video(args.profile)
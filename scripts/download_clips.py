@@ -3,205 +3,792 @@ import os
 import json
 import sys
 import re # Importation pour les expressions régulières
+import math
+import time
+import argparse
+import threading
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import yt_dlp
+
+import clip_cache
+from clip_index import mark_clips_unusable
+from caption_overlays import render_caption
+from ffmpeg_runner import job_records, run_job, summarize_jobs
+from run_report import add_metrics, stage_report
+from clip_manifest import MANIFEST_PATH, list_manifest_profiles, manifest_path, load_manifest, append_stage
 
-INPUT_CLIPS_JSON = os.path.join("data", "top_clips.json")
 RAW_CLIPS_DIR = os.path.join("data", "raw_clips") # Keep original downloads here
 PROCESSED_CLIPS_DIR = os.path.join("data", "processed_clips") # New directory for consistent clips
 CLIP_FRAMES_DIR = os.path.join("data", "clip_frames") # Nouveau dossier pour les frames extraites
 
-def get_video_duration(filepath):
+# Téléchargements simultanés (limités par le réseau, pas par le CPU)
+MAX_DOWNLOAD_WORKERS = 4
+
+# Encodages FFmpeg simultanés, et threads accordés à chacun : le total reste égal au nombre de cœurs
+# pour ne pas surcharger la machine (runner GitHub Actions à 4 cœurs : 2 encodages de 2 threads).
+# Le budget global de ffmpeg_runner.py (FFMPEG_THREAD_BUDGET) borne en plus l'ensemble des commandes.
+CPU_COUNT = os.cpu_count() or 1
+ENCODE_WORKERS = max(1, CPU_COUNT // 2)
+FFMPEG_THREADS_PER_ENCODE = max(1, CPU_COUNT // ENCODE_WORKERS)
+
+# État de chaque clip de l'étape (pending / downloaded / processed / failed), réécrit après chaque étape d'un clip :
+# une nouvelle exécution reprend uniquement le travail manquant ou en échec.
+DOWNLOAD_STATE_PATH = os.path.join(".cache", "download_state.json")
+
+# Tentatives par clip (toutes exécutions confondues) : au-delà, le clip est ignoré sans bloquer le lot
+MAX_CLIP_ATTEMPTS = 3
+
+# Délai maximal sans données d'un téléchargement ou d'une lecture en streaming (secondes)
+NETWORK_TIMEOUT_SECONDS = 30
+
+# Options de yt-dlp, utilisé en bibliothèque (pas de processus ni de chargement des extracteurs par clip)
+YT_DLP_OPTIONS = {
+    "format": "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
+    "outtmpl": os.path.join(RAW_CLIPS_DIR, "%(id)s_raw.%(ext)s"),
+    "quiet": True,
+    "no_warnings": True,
+    "noprogress": True, # Les téléchargements sont parallèles : pas de barre de progression entremêlée
+    "socket_timeout": NETWORK_TIMEOUT_SECONDS,
+    "retries": 3,
+}
+
+# Mode streaming : FFmpeg lit le clip directement depuis son URL (le fichier brut n'est jamais écrit sur disque
+# et l'encodage démarre dès les premiers octets). Les formats à fusionner (vidéo + audio séparés) ou servis par
+# un autre protocole sont téléchargés dans RAW_CLIPS_DIR comme avant.
+STREAM_CLIPS = True
+STREAMABLE_PROTOCOLS = ("http", "https", "m3u8", "m3u8_native")
+
+@dataclass(slots=True)
+class StreamSource:
+    """Média d'un clip lu à distance par FFmpeg (URL résolue par yt-dlp et en-têtes HTTP à envoyer)."""
+    url: str
+    http_headers: dict
+
+class ClipProcessingError(Exception):
+    """Échec du traitement d'un clip, avec l'étape concernée ("download", "preprocess" ou "timecode")."""
+    def __init__(self, clip_id, stage, message):
+        super().__init__(f"{stage}: {message}")
+        self.clip_id = clip_id
+        self.stage = stage
+        self.message = message
+
+class _YtDlpLogger:
+    # Les erreurs sont remontées par les exceptions de yt-dlp et rapportées par clip
+    def debug(self, message):
+        pass
+
+    def warning(self, message):
+        pass
+
+    def error(self, message):
+        pass
+
+# YoutubeDL n'est pas prévu pour des téléchargements simultanés : chaque worker a sa propre instance,
+# réutilisée pour tous ses clips (extracteurs initialisés et connexions HTTP conservées).
+_downloader_local = threading.local()
+_downloaders = []
+_downloaders_lock = threading.Lock()
+
+# Transferts yt-dlp de ce processus (rapport d'exécution) ; en streaming, la taille annoncée du format
+_transfer_lock = threading.Lock()
+transfer_stats = {"downloads": 0, "streams": 0, "seconds": 0.0, "bytes_read": 0}
+
+def _count_transfer(kind, seconds, size):
+    with _transfer_lock:
+        transfer_stats[kind] += 1
+        transfer_stats["seconds"] += seconds
+        transfer_stats["bytes_read"] += size or 0
+
+class DownloadState:
+    """État par clip de l'étape de téléchargement, partagé par les workers et écrit de façon atomique."""
+    def __init__(self, path=None):
+        self.path = path or DOWNLOAD_STATE_PATH
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.clips = json.load(f)
+        except (OSError, ValueError):
+            self.clips = {}
+
+    def get(self, clip_id):
+        with self._lock:
+            return dict(self.clips.get(clip_id, {}))
+
+    def update(self, clip_id, **fields):
+        with self._lock:
+            self.clips.setdefault(clip_id, {"state": "pending", "attempts": 0}).update(fields)
+            self._save()
+
+    def fail(self, clip_id, error):
+        with self._lock:
+            entry = self.clips.setdefault(clip_id, {"state": "pending", "attempts": 0})
+            entry.update(state="failed", attempts=entry.get("attempts", 0) + 1, error=str(error))
+            self._save()
+
+    def keep_only(self, clip_ids):
+        """Oublie les clips qui ne font plus partie du lot (nouvelle sélection)."""
+        with self._lock:
+            self.clips = {clip_id: self.clips.get(clip_id, {"state": "pending", "attempts": 0}) for clip_id in clip_ids}
+            self._save()
+
+    def _save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.clips, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+def _file_has_size(path, size):
+    return bool(path) and bool(size) and os.path.exists(path) and os.path.getsize(path) == size
+
+# Champs du résultat d'un clip prétraité, conservés dans l'état de l'étape
+RESULT_FIELDS = ("path", "media_duration", "first_frame_path", "passthrough", "timecode", "loudness")
+
+def reusable_result(entry, key):
+    """
+    Résultat d'un clip déjà prétraité lors d'une exécution précédente avec les mêmes paramètres,
+    si ses fichiers sont intacts (taille, durée).
+    """
+    if entry.get("state") != "processed" or entry.get("key") != key or not entry.get("media_duration", 0) > 0:
+        return None
+    if not _file_has_size(entry.get("path"), entry.get("size")) or not os.path.exists(entry.get("first_frame_path") or ""):
+        return None
+    return {field: entry.get(field) for field in RESULT_FIELDS} | {"error": None}
+
+def reusable_raw_file(entry):
+    """Fichier brut téléchargé lors d'une exécution précédente, s'il est complet."""
+    if _file_has_size(entry.get("raw_path"), entry.get("raw_size")):
+        return entry["raw_path"]
+    return None
+
+def get_downloader():
+    downloader = getattr(_downloader_local, "downloader", None)
+    if downloader is None:
+        downloader = yt_dlp.YoutubeDL({**YT_DLP_OPTIONS, "logger": _YtDlpLogger()})
+        _downloader_local.downloader = downloader
+        with _downloaders_lock:
+            _downloaders.append(downloader)
+    return downloader
+
+def close_downloaders():
+    with _downloaders_lock:
+        for downloader in _downloaders:
+            downloader.close()
+        _downloaders.clear()
+
+def media_format(info):
+    """Caractéristiques du média choisi par yt-dlp (codecs, définition, fréquence d'images), sans appel à ffprobe."""
+    return {field: info.get(field) for field in ("vcodec", "acodec", "width", "height", "fps")}
+
+def download_raw_clip(clip, position, total):
+    """
+    Télécharge un clip avec l'instance yt-dlp du worker. Retourne le chemin du fichier brut et les caractéristiques
+    de son média (voir media_format) ; lève ClipProcessingError.
+    """
+    print(f"Téléchargement du clip {position+1}/{total}: {clip.title} par {clip.broadcaster_name} (ID: {clip.id})...")
+    downloader = get_downloader()
+    start = time.perf_counter()
+    try:
+        info = downloader.extract_info(clip.url, download=True)
+    except yt_dlp.utils.DownloadError as e:
+        raise ClipProcessingError(clip.id, "download", str(e).removeprefix("ERROR: ")) from e
+    except Exception as e:
+        raise ClipProcessingError(clip.id, "download", f"erreur inattendue : {e}") from e
+    downloads = info.get("requested_downloads") or [{}]
+    raw_output_filename = downloads[0].get("filepath") or downloader.prepare_filename(info)
+    print(f"  ✅ Clip téléchargé: {raw_output_filename}")
+    _count_transfer("downloads", time.perf_counter() - start, os.path.getsize(raw_output_filename) if os.path.exists(raw_output_filename) else 0)
+    clip_cache.store_raw(clip.id, raw_output_filename)
+    return raw_output_filename, media_format(info)
+
+def render_clip_caption(clip):
+    """
+    Légende d'un clip (titre et streamer), rendue en PNG. Superposée au prétraitement, ou au rendu final
+    (compile_video.py) pour un clip en passthrough.
+    """
+    return render_caption([clip.title, clip.broadcaster_name], font_size=36, fill="white", stroke_fill="black", stroke_width=2)
+
+# Position de la légende d'un clip (centrée, en haut de l'image), pour le filtre overlay
+CLIP_CAPTION_POSITION = "x=(W-w)/2:y=H*0.04"
+
+# Mode de rendu : le timecode de chaque clip (son début dans la compilation) est incrusté par cette étape, une fois
+# tous les clips prétraités et leurs durées réelles connues, et le rendu final de compile_video.py n'est plus qu'une
+# concaténation sans réencodage. Le clip prétraité (en cache) reste sans timecode : un clip qui change de position
+# d'un jour à l'autre n'est ni retéléchargé ni réencodé en entier, seul le début portant le timecode est réencodé.
+# Désactivé, les timecodes sont incrustés par le rendu final, qui réencode alors chaque clip.
+BURN_TIMECODES = True
+
+# Position des timecodes (centrés, en bas de l'image) et durée d'affichage au début de chaque clip
+TIMECODE_CAPTION_POSITION = "x=(W-w)/2:y=H-h-20"
+TIMECODE_DISPLAY_SECONDS = 5
+
+def format_duration(seconds):
+    """Formate une durée en secondes en HH:MM:SS."""
+    if seconds < 0:
+        seconds = 0
+    hours = int(seconds // 3600)
+    minutes = int((seconds % 3600) // 60)
+    seconds = int(seconds % 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}"
+
+def render_timecode_caption(clip, timecode):
+    """Timecode d'un clip dans la compilation ("HH:MM:SS - titre par streamer"), rendu en PNG."""
+    text_content = f"{timecode} - {clip.title} par {clip.broadcaster_name}"
+    return render_caption([text_content], font_size=36, fill="white", box_fill=(0, 0, 0, 153), padding=6)
+
+def plan_timecodes(clips_per_profile, durations):
+    """
+    Timecode de chaque clip dans la compilation de son profil, d'après `durations` (ID du clip → durée réelle ; les clips
+    absents ne sont pas compilés). None pour un clip commun à plusieurs profils à des positions différentes :
+    son timecode est alors incrusté par le rendu final.
+    """
+    timecodes = {}
+    for profile_clips in clips_per_profile.values():
+        offset = 0.0
+        for clip in profile_clips:
+            if clip.id not in durations:
+                continue
+            timecode = format_duration(offset)
+            timecodes[clip.id] = timecode if timecodes.get(clip.id, timecode) == timecode else None
+            offset += durations[clip.id]
+    return timecodes
+
+# Normalisation du volume de chaque clip au prétraitement (loudnorm en une passe, avec anticipation), dans le même
+# encodage : les clips de la compilation ont tous le même volume et l'audio final est concaténé sans réencodage.
+# Les mesures du filtre (volume intégré, crête, plage) sont enregistrées dans le manifeste (champ loudness).
+LOUDNORM_FILTER = "loudnorm=I=-16:TP=-1.5:LRA=11:print_format=json"
+LOUDNORM_STATS_PATTERN = re.compile(r'\{[^{}]*"input_i"[^{}]*\}')
+LOUDNESS_FIELDS = ("input_i", "input_tp", "input_lra", "input_thresh", "output_i", "target_offset")
+
+AUDIO_OUTPUT_ARGS = [
+    "-af", LOUDNORM_FILTER,
+    "-c:a", "aac",
+    "-b:a", "192k",
+    "-ac", "2",
+    "-ar", "44100", # loudnorm travaille à 192 kHz : fréquence de sortie explicite
+]
+
+# Encodage vidéo des clips prétraités, repris pour les segments réencodés par compile_video.py :
+# des paramètres identiques permettent de concaténer clips et segments sans réencodage.
+VIDEO_OUTPUT_ARGS = [
+    "-c:v", "libx264",
+    "-preset", "fast",
+    "-crf", "23",
+    "-pix_fmt", "yuv420p",
+]
+
+def parse_loudness(stderr):
+    """Mesures du filtre loudnorm dans la sortie de FFmpeg (valeurs finies uniquement), ou None si elles sont absentes."""
+    matches = LOUDNORM_STATS_PATTERN.findall(stderr or "")
+    if not matches:
+        return None
+    try:
+        stats = json.loads(matches[-1])
+        values = {key: float(stats[key]) for key in LOUDNESS_FIELDS if key in stats}
+    except (ValueError, TypeError):
+        return None
+    return {key: value for key, value in values.items() if math.isfinite(value)} or None
+
+def build_preprocess_args(clip):
+    """
+    Paramètres FFmpeg du prétraitement d'un clip (légende en entrée n°1, graphe de filtres, codecs), sans le clip
+    (entrée n°0) ni les fichiers de sortie. Le graphe se divise en deux : le clip normalisé ("[v]") et sa première
+    frame ("[frame]"), produits en une seule passe.
+    Ces paramètres déterminent entièrement le résultat, sans le timecode (incrusté ensuite, voir burn_timecode) :
+    leur empreinte sert de clé au cache des clips prétraités, quelle que soit la position du clip dans la compilation.
+    """
+    video_filters = (
+        "scale=1920:1080:force_original_aspect_ratio=decrease,"
+        "pad=1920:1080:(ow-iw)/2:(oh-ih)/2,"
+        "setsar=1,fps=30"
+    )
+    # trim termine la branche de la frame après une image : split ne garde pas le reste du clip en mémoire pour elle
+    filter_graph = f"[0:v]{video_filters}[base];[base][1:v]overlay={CLIP_CAPTION_POSITION},split=2[v][frame0];[frame0]trim=end_frame=1[frame]"
+
+    return [
+        "-i", render_clip_caption(clip),
+        "-filter_complex", filter_graph,
+        "-map", "[v]",
+        "-map", "0:a:0?",
+        *VIDEO_OUTPUT_ARGS,
+        # Image clé à la fin de l'affichage du timecode : la suite du clip est copiée telle quelle par burn_timecode
+        *(["-force_key_frames", str(TIMECODE_DISPLAY_SECONDS), "-forced-idr", "1"] if BURN_TIMECODES else []),
+        *AUDIO_OUTPUT_ARGS,
+    ]
+
+# Sortie de la première frame du clip, dans la même commande que l'encodage
+FIRST_FRAME_OUTPUT_ARGS = [
+    "-map", "[frame]",
+    "-frames:v", "1",
+    "-q:v", "2", # Qualité de sortie (1-31, 1 est le meilleur)
+]
+
+# Passthrough : la vidéo d'un clip déjà au format cible (H.264 1080p ~30 i/s, AAC) est copiée sans réencodage (seul
+# l'audio est normalisé) ; son titre, son streamer et son timecode sont alors incrustés par le rendu final de
+# compile_video.py, qui réencode ce clip une seule fois.
+PASSTHROUGH_CLIPS = True
+TARGET_VIDEO_CODEC = "h264"
+TARGET_WIDTH, TARGET_HEIGHT = 1920, 1080
+TARGET_FPS = 30
+TARGET_PIX_FMT = "yuv420p"
+TARGET_AUDIO_CODEC = "aac"
+
+PASSTHROUGH_ARGS = [
+    "-map", "0:v:0",
+    "-map", "0:a:0",
+    "-c:v", "copy",
+    *AUDIO_OUTPUT_ARGS,
+]
+PASSTHROUGH_FIRST_FRAME_OUTPUT_ARGS = [
+    "-map", "0:v:0",
+    "-frames:v", "1",
+    "-q:v", "2",
+]
+
+# Profils H.264 en 8 bits 4:2:0 (octet de profil du codec "avc1.PPCCLL" annoncé par yt-dlp) : Baseline, Main, Extended, High
+TARGET_VIDEO_PROFILES = ("42", "4d", "58", "64")
+
+def matches_target_format(media):
     """
-    Obtient la durée d'une vidéo en secondes en utilisant ffprobe.
-    Retourne 0.0 si la durée ne peut pas être déterminée.
+    Le clip peut-il être concaténé tel quel avec les clips prétraités ? D'après les caractéristiques annoncées par yt-dlp
+    (voir media_format) : aucun ffprobe, pas de lecture supplémentaire du flux. None (inconnues) : le clip est réencodé.
     """
+    if not media:
+        return False
+    vcodec, acodec = (media.get("vcodec") or "").lower(), (media.get("acodec") or "").lower()
+    return (
+        vcodec.startswith("avc1.") and vcodec[5:7] in TARGET_VIDEO_PROFILES
+        and acodec.startswith("mp4a.40") # AAC
+        and (media.get("width"), media.get("height")) == (TARGET_WIDTH, TARGET_HEIGHT)
+        and abs((media.get("fps") or 0) - TARGET_FPS) < 0.5
+    )
+
+def preprocess_cache_key(clip):
+    return clip_cache.cache_key(clip.id, build_preprocess_args(clip))
+
+def processed_paths(clip):
+    """Chemins du clip prétraité et de sa première frame."""
+    return (
+        os.path.join(PROCESSED_CLIPS_DIR, f"{clip.id}_processed.mp4"),
+        os.path.join(CLIP_FRAMES_DIR, f"{clip.id}_first_frame.jpg"),
+    )
+
+def resolve_clip_source(clip, position, total):
+    """
+    Source du clip pour le prétraitement : StreamSource si le format choisi par yt-dlp peut être lu directement
+    par FFmpeg, sinon le chemin du fichier téléchargé ; avec les caractéristiques du média (voir media_format).
+    Lève ClipProcessingError.
+    """
+    if not STREAM_CLIPS:
+        return download_raw_clip(clip, position, total)
+    downloader = get_downloader()
     try:
-        cmd = [
-            "ffprobe",
-            "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            filepath
+        info = downloader.extract_info(clip.url, download=False)
+    except yt_dlp.utils.DownloadError as e:
+        raise ClipProcessingError(clip.id, "download", str(e).removeprefix("ERROR: ")) from e
+    except Exception as e:
+        raise ClipProcessingError(clip.id, "download", f"erreur inattendue : {e}") from e
+    formats = info.get("requested_formats") or [info]
+    if len(formats) == 1 and formats[0].get("url") and formats[0].get("protocol") in STREAMABLE_PROTOCOLS:
+        print(f"Clip {position+1}/{total} lu en streaming : {clip.title} par {clip.broadcaster_name} (ID: {clip.id}).")
+        _count_transfer("streams", 0.0, formats[0].get("filesize") or formats[0].get("filesize_approx"))
+        return StreamSource(formats[0]["url"], formats[0].get("http_headers") or {}), media_format(formats[0])
+    return download_raw_clip(clip, position, total)
+
+def ffmpeg_input_args(source):
+    """Arguments d'entrée FFmpeg pour un fichier local ou un StreamSource."""
+    if isinstance(source, str):
+        return ["-i", source]
+    headers = "".join(f"{name}: {value}\r\n" for name, value in source.http_headers.items())
+    # Le protocole HTTP de FFmpeg fait des requêtes Range quand le conteneur impose un déplacement (index MP4 en fin de fichier)
+    return ["-reconnect", "1", "-reconnect_delay_max", "5", "-rw_timeout", str(NETWORK_TIMEOUT_SECONDS * 1_000_000),
+            *(["-headers", headers] if headers else []), "-i", source.url]
+
+def encode_clip(clip, source, media, position, total):
+    """Prétraite un clip ; si la lecture en streaming échoue, le clip est téléchargé puis prétraité depuis le fichier."""
+    try:
+        return preprocess_clip(clip, source, media, position, total)
+    except ClipProcessingError as e:
+        if isinstance(source, str):
+            raise
+        print(f"  ⚠️ Échec du prétraitement en streaming du clip {clip.id} ({e.message}). Téléchargement du fichier...")
+    return preprocess_clip(clip, *download_raw_clip(clip, position, total), position, total)
+
+def resolve_task(state, clip, position, total):
+    """Récupère la source d'un clip et enregistre l'étape dans l'état (fichier téléchargé ou échec)."""
+    try:
+        source, media = resolve_clip_source(clip, position, total)
+    except ClipProcessingError as e:
+        state.fail(clip.id, e)
+        raise
+    if isinstance(source, str):
+        state.update(clip.id, state="downloaded", raw_path=source, raw_size=os.path.getsize(source), media_format=media)
+    return source, media
+
+def encode_task(state, clip, source, media, position, total):
+    """Prétraite un clip et enregistre le résultat (ou l'échec) dans l'état dès la fin de l'encodage."""
+    try:
+        result = encode_clip(clip, source, media, position, total)
+    except ClipProcessingError as e:
+        state.fail(clip.id, e)
+        raise
+    state.update(clip.id, state="processed", error=None, attempts=0, key=preprocess_cache_key(clip), size=os.path.getsize(result["path"]),
+                 **{field: result[field] for field in RESULT_FIELDS})
+    return result
+
+def output_duration(job, fps):
+    """Durée du fichier écrit par une commande FFmpeg, d'après sa progression (images écrites et out_time)."""
+    try:
+        frames = int(job.progress.get("frame", 0))
+    except ValueError:
+        frames = 0
+    return max(job.out_time, frames / fps if fps else 0.0)
+
+def preprocess_clip(clip, source, media, position, total):
+    """
+    Normalise un clip, téléchargé ou lu en streaming (format, codecs, texte), et produit sa première frame et sa durée
+    dans la même exécution de FFmpeg, puis ajoute le résultat au cache des clips. Un clip déjà au format cible est copié
+    sans réencodage (passthrough), d'après les caractéristiques `media` annoncées par yt-dlp. Retourne les champs
+    ajoutés au manifeste ; lève ClipProcessingError.
+    """
+    clip_id = clip.id
+    processed_output_filename, first_frame_output_path = processed_paths(clip)
+
+    try:
+        preprocess_args = build_preprocess_args(clip)
+        passthrough = PASSTHROUGH_CLIPS and matches_target_format(media)
+        if passthrough:
+            print(f"  Copie de la vidéo du clip {position+1}/{total} sans réencodage (déjà au format cible): {clip.title}...")
+            output_args, first_frame_args = PASSTHROUGH_ARGS, PASSTHROUGH_FIRST_FRAME_OUTPUT_ARGS
+        else:
+            # Prétraitement avec FFmpeg pour normaliser le format, les codecs et ajouter du texte
+            print(f"  Prétraitement du clip {position+1}/{total}: {clip.title} (ajout du texte)...")
+            output_args, first_frame_args = preprocess_args, FIRST_FRAME_OUTPUT_ARGS
+
+        # Les sorties d'une exécution précédente peuvent être des liens vers le cache : on ne les écrase pas en place
+        for path in (processed_output_filename, first_frame_output_path):
+            if os.path.lexists(path):
+                os.remove(path)
+
+        ffmpeg_preprocess_command = [
+            "ffmpeg",
+            *ffmpeg_input_args(source),
+            *output_args,
+            "-threads", str(FFMPEG_THREADS_PER_ENCODE),
+            "-hide_banner",
+            "-loglevel", "info", # Les mesures de loudnorm sont écrites au niveau info
+            "-y",
+            processed_output_filename,
+            *first_frame_args,
+            first_frame_output_path
         ]
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return float(result.stdout.strip())
-    except (subprocess.CalledProcessError, ValueError) as e:
-        print(f"  ⚠️ Impossible d'obtenir la durée de {filepath} avec ffprobe: {e}")
-        return 0.0
-
-def ffmpeg_escape_string(text):
-    """
-    Escapes characters in a string for FFmpeg drawtext filter to prevent syntax errors.
-    Handles backslashes, single quotes, colons, and square brackets.
-    """
-    # Escape backslashes first, then single quotes, then colons
-    text = text.replace('\\', '\\\\')
-    text = text.replace("'", "\\'")
-    text = text.replace(':', '\\:')
-    text = text.replace('[', '\\[')
-    text = text.replace(']', '\\]')
-    # Commas can also be an issue if they're not intended as separators
-    text = text.replace(',', '\\,')
-    return text
-
-def download_clips():
+        job = run_job(ffmpeg_preprocess_command, threads=FFMPEG_THREADS_PER_ENCODE, label=f"prétraitement {clip_id}")
+        print(f"  ✅ Clip {'copié' if passthrough else 'prétraité avec texte'} et première frame extraite: {processed_output_filename} "
+              f"({job.wall_seconds:.1f}s, x{job.speed or 0:.1f}, CPU {job.cpu_seconds or 0:.1f}s, RSS max {job.peak_rss_mb or 0:.0f} Mo)")
+
+        # La durée sert à placer les timecodes : elle est tirée du dernier bloc de progression de FFmpeg (sans ffprobe).
+        # Le out_time s'arrête au début du dernier paquet : le nombre d'images écrites donne la fin réelle de la vidéo
+        # (une image de plus par clip, qui se cumulerait sur la compilation).
+        actual_duration = output_duration(job, media.get("fps") if passthrough else TARGET_FPS)
+        loudness = parse_loudness(job.stderr_tail)
+        print(f"  Durée réelle du clip traité: {actual_duration:.2f} secondes"
+              + (f", volume d'origine {loudness['input_i']:.1f} LUFS." if loudness and "input_i" in loudness else "."))
+        if actual_duration > 0:
+            clip_cache.store_processed(clip_cache.cache_key(clip_id, preprocess_args), processed_output_filename, first_frame_output_path,
+                                       {"media_duration": actual_duration, "passthrough": passthrough, "loudness": loudness})
+
+        return {
+            "id": clip_id,
+            "path": processed_output_filename,
+            "media_duration": actual_duration,
+            "first_frame_path": first_frame_output_path, # Ajoute le chemin de la frame
+            "passthrough": passthrough, # Texte à incruster au rendu final
+            "timecode": None, # Timecode incrusté (None : incrusté au rendu final), voir burn_timecode
+            "loudness": loudness, # Mesures de loudnorm (volume d'origine du clip)
+            "error": None
+        }
+    except subprocess.CalledProcessError as e:
+        details = (e.stderr or "").strip().splitlines()
+        raise ClipProcessingError(clip_id, "preprocess", f"{os.path.basename(e.cmd[0])} a échoué (code {e.returncode})" + (f" : {details[-1]}" if details else "")) from e
+    except Exception as e:
+        raise ClipProcessingError(clip_id, "preprocess", f"erreur inattendue : {e}") from e
+
+def is_abandoned(entry):
+    return entry.get("state") == "failed" and entry.get("attempts", 0) >= MAX_CLIP_ATTEMPTS
+
+def restore_result(state, clip):
+    """Résultat d'un clip déjà prétraité avec ces paramètres (exécution précédente ou cache des clips), sinon None."""
+    key = preprocess_cache_key(clip)
+    resumed = reusable_result(state.get(clip.id), key)
+    if resumed:
+        return {"id": clip.id, **resumed}
+    processed_output_filename, first_frame_output_path = processed_paths(clip)
+    cached = clip_cache.restore_processed(key, processed_output_filename, first_frame_output_path)
+    if not (cached and cached.get("media_duration")):
+        return None
+    result = {"id": clip.id, "path": processed_output_filename, "media_duration": cached["media_duration"],
+              "first_frame_path": first_frame_output_path, "passthrough": cached.get("passthrough", False), "timecode": None,
+              "loudness": cached.get("loudness"), "error": None}
+    state.update(clip.id, state="processed", error=None, attempts=0, key=key, size=os.path.getsize(processed_output_filename),
+                 **{field: result[field] for field in RESULT_FIELDS})
+    return result
+
+def find_raw_file(state, clip):
+    """Fichier brut déjà téléchargé (exécution précédente ou cache des clips), sinon None."""
+    return reusable_raw_file(state.get(clip.id)) or clip_cache.restore_raw(clip.id, RAW_CLIPS_DIR)
+
+def run_pipeline(state, clips, results, to_download, to_encode):
+    """
+    Télécharge (ou résout en streaming) les clips `to_download` et prétraite au fil de l'eau ceux-ci et les fichiers
+    bruts `to_encode` ; les résultats (ou ClipProcessingError) sont placés dans `results`, à l'indice de chaque clip.
+    """
+    with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as download_pool, ThreadPoolExecutor(max_workers=ENCODE_WORKERS) as encode_pool:
+        encode_futures = [(i, encode_pool.submit(encode_task, state, clips[i], raw_output_filename, media, i, len(clips)))
+                          for i, raw_output_filename, media in to_encode]
+        download_futures = {download_pool.submit(resolve_task, state, clips[i], i, len(clips)): i for i in to_download}
+        for future in as_completed(download_futures):
+            i = download_futures[future]
+            try:
+                source, media = future.result()
+            except ClipProcessingError as e:
+                results[i] = e
+                continue
+            encode_futures.append((i, encode_pool.submit(encode_task, state, clips[i], source, media, i, len(clips))))
+        for i, future in encode_futures:
+            try:
+                results[i] = future.result()
+            except ClipProcessingError as e:
+                results[i] = e
+
+def burn_timecode(clip, result, timecode):
+    """
+    Incruste le timecode d'un clip prétraité : seules ses TIMECODE_DISPLAY_SECONDS premières secondes sont réencodées
+    avec la légende, la suite de la vidéo (depuis l'image clé forcée au prétraitement) et l'audio sont copiés.
+    Le clip obtenu est conservé dans le cache des clips, adressé par son contenu, et placé dans PROCESSED_CLIPS_DIR
+    (lien physique) : l'éviction du cache ne peut pas le retirer avant le rendu final. Retourne le résultat mis à jour ;
+    lève ClipProcessingError.
+    """
+    caption_path = render_timecode_caption(clip, timecode)
+    processed_path = os.path.abspath(result["path"])
+    key = clip_cache.segment_key([
+        clip_cache.file_digest(processed_path),
+        clip_cache.file_digest(caption_path), TIMECODE_CAPTION_POSITION, TIMECODE_DISPLAY_SECONDS,
+        VIDEO_OUTPUT_ARGS,
+    ])
+    timecoded_path = os.path.join(PROCESSED_CLIPS_DIR, f"{clip.id}_timecoded.mp4")
+    cached_path = clip_cache.restore_segment(key, timecoded_path)
+    if cached_path:
+        return result | {"path": cached_path, "timecode": timecode}
+
+    head_path = os.path.join(PROCESSED_CLIPS_DIR, f"{clip.id}_timecode_head.mp4")
+    parts_path = os.path.join(PROCESSED_CLIPS_DIR, f"{clip.id}_timecode_parts.txt")
+    # Une sortie d'une exécution précédente peut être un lien vers le cache : on ne l'écrase pas en place
+    if os.path.lexists(timecoded_path):
+        os.remove(timecoded_path)
+    # Début du clip (vidéo seule) avec le timecode, puis le reste du clip prétraité à partir de l'image clé
+    parts = [(head_path, None)]
+    if result["media_duration"] > TIMECODE_DISPLAY_SECONDS:
+        parts.append((processed_path, TIMECODE_DISPLAY_SECONDS))
+    try:
+        run_job([
+            "ffmpeg",
+            "-i", processed_path,
+            "-i", caption_path,
+            "-filter_complex", f"[0:v]trim=end_frame={round(TIMECODE_DISPLAY_SECONDS * TARGET_FPS)}[head];[head][1:v]overlay={TIMECODE_CAPTION_POSITION}[v]",
+            "-map", "[v]",
+            "-an",
+            *VIDEO_OUTPUT_ARGS,
+            "-threads", str(FFMPEG_THREADS_PER_ENCODE),
+            "-hide_banner",
+            "-y",
+            head_path
+        ], threads=FFMPEG_THREADS_PER_ENCODE, label=f"timecode {clip.id}")
+        with open(parts_path, "w", encoding="utf-8") as f:
+            for path, inpoint in parts:
+                escaped_path = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped_path}'\n" + (f"inpoint {inpoint}\n" if inpoint else ""))
+        # La vidéo vient de la liste (les flux audio des parties sont ignorés), l'audio normalisé du clip prétraité
+        run_job([
+            "ffmpeg",
+            "-f", "concat",
+            "-safe", "0",
+            "-i", parts_path,
+            "-i", processed_path,
+            "-map", "0:v:0",
+            "-map", "1:a:0?",
+            "-c", "copy",
+            "-hide_banner",
+            "-y",
+            timecoded_path
+        ], label=f"assemblage {clip.id}")
+    except subprocess.CalledProcessError as e:
+        details = (e.stderr or "").strip().splitlines()
+        raise ClipProcessingError(clip.id, "timecode", f"ffmpeg a échoué (code {e.returncode})" + (f" : {details[-1]}" if details else "")) from e
+    finally:
+        for path in (head_path, parts_path):
+            if os.path.exists(path):
+                os.remove(path)
+    stored_path = clip_cache.store_segment(key, timecoded_path)
+    return result | {"path": clip_cache.restore_segment(key, timecoded_path) or stored_path, "timecode": timecode}
+
+def burn_timecodes(clips_per_profile, results):
+    """
+    Planifie les timecodes d'après les durées réelles des clips prétraités et les incruste en parallèle (résultats
+    remplacés dans `results`). Les clips en passthrough, et ceux dont le timecode diffère d'un profil à l'autre,
+    restent sans timecode : le rendu final l'incruste. Un échec laisse le clip sans timecode, sans l'écarter.
+    """
+    timecodes = plan_timecodes(clips_per_profile, {result["id"]: result["media_duration"] for result in results if isinstance(result, dict)})
+    to_burn = [i for i, result in enumerate(results) if isinstance(result, dict) and not result["passthrough"] and timecodes.get(result["id"])]
+    if not to_burn:
+        return
+    clips_by_id = {clip.id: clip for profile_clips in clips_per_profile.values() for clip in profile_clips}
+    print(f"🕒 Incrustation des timecodes de {len(to_burn)} clip(s) ({TIMECODE_DISPLAY_SECONDS}s réencodées par clip)...")
+    with ThreadPoolExecutor(max_workers=ENCODE_WORKERS) as pool:
+        futures = [(i, pool.submit(burn_timecode, clips_by_id[results[i]["id"]], results[i], timecodes[results[i]["id"]])) for i in to_burn]
+        for i, future in futures:
+            try:
+                results[i] = future.result()
+            except ClipProcessingError as e:
+                print(f"  ⚠️ Timecode du clip {e.clip_id} non incrusté ({e.message}) : il sera incrusté par le rendu final.")
+
+def download_clips(profiles=None):
+    """
+    Télécharge et prétraite les clips des manifestes des profils donnés (par défaut : tous les manifestes présents).
+    Un clip sélectionné par plusieurs profils n'est traité qu'une fois ; son résultat est ajouté à chaque manifeste.
+    """
     print("📥 Démarrage du téléchargement et du prétraitement des clips Twitch individuels...")
     os.makedirs(RAW_CLIPS_DIR, exist_ok=True)
     os.makedirs(PROCESSED_CLIPS_DIR, exist_ok=True) # Create the new processed clips directory
     os.makedirs(CLIP_FRAMES_DIR, exist_ok=True) # Créer le nouveau dossier pour les frames
 
-    if not os.path.exists(INPUT_CLIPS_JSON):
-        print(f"❌ Fichier des clips '{INPUT_CLIPS_JSON}' introuvable.")
-        # Écrire un fichier JSON vide pour downloaded_clip_paths.json
-        with open(os.path.join("data", "downloaded_clip_paths.json"), "w") as f:
-            json.dump([], f)
+    profiles = profiles or list_manifest_profiles()
+    if not profiles or not all(os.path.exists(manifest_path(profile)) for profile in profiles):
+        print(f"❌ Manifeste des clips introuvable (profils : {', '.join(profiles) or 'aucun'}, manifeste par défaut : '{MANIFEST_PATH}').")
         sys.exit(1)
 
-    with open(INPUT_CLIPS_JSON, "r", encoding="utf-8") as f:
-        clips = json.load(f)
+    clips_per_profile = {profile: load_manifest(manifest_path(profile)) for profile in profiles}
+    # Clips uniques, dans l'ordre des profils puis de la sélection
+    unique_clips = {}
+    for profile_clips in clips_per_profile.values():
+        for clip in profile_clips:
+            unique_clips.setdefault(clip.id, clip)
+    clips = list(unique_clips.values())
+    print(f"{len(clips)} clips uniques à traiter pour {len(profiles)} profil(s) : {', '.join(profiles)}.")
 
-    # --- DÉBOGAGE : Aperçu des données lues depuis top_clips.json ---
+    # --- DÉBOGAGE : Aperçu des données lues depuis le manifeste ---
     if clips:
-        print("\n--- Aperçu des données lues depuis top_clips.json dans download_clips.py ---")
+        print("\n--- Aperçu des données lues depuis le manifeste dans download_clips.py ---")
         for i, clip_data in enumerate(clips[:3]): # Affiche les 3 premiers clips pour vérification
             print(f"Clip {i+1}:")
-            print(f"  ID: {clip_data.get('id', 'N/A')}")
-            print(f"  Title: {clip_data.get('title', 'N/A')}")
-            print(f"  Broadcaster Name: {clip_data.get('broadcaster_name', 'N/A')}")
-            print(f"  URL: {clip_data.get('url', 'N/A')}")
+            print(f"  ID: {clip_data.id}")
+            print(f"  Title: {clip_data.title}")
+            print(f"  Broadcaster Name: {clip_data.broadcaster_name}")
+            print(f"  URL: {clip_data.url}")
         print("----------------------------------------------------------------------\n")
     # --- FIN DÉBOGAGE ---
 
     if not clips:
         print("⚠️ Aucun clip à télécharger. La liste des clips est vide.")
-        with open(os.path.join("data", "downloaded_clip_paths.json"), "w") as f:
-            json.dump([], f)
         return
 
-    downloaded_and_processed_info = [] # Will store dicts with path, id, and actual duration
-    for i, clip in enumerate(clips):
-        clip_url = clip["url"]
+    # Pipeline : les téléchargements ou résolutions d'URL (réseau) alimentent les encodages (CPU) au fil de l'eau
+    print(f"Pipeline : {MAX_DOWNLOAD_WORKERS} téléchargements et {ENCODE_WORKERS} encodages simultanés ({FFMPEG_THREADS_PER_ENCODE} threads FFmpeg chacun).")
+    results = [None] * len(clips)
+
+    # Reprise : état de l'exécution précédente (clips déjà prétraités ou téléchargés, échecs et tentatives)
+    state = DownloadState()
+    state.keep_only([clip.id for clip in clips])
 
-        clip_id = clip.get("id", f"unknown_id_{i}")
-        clip_title_raw = clip.get("title", "Titre inconnu")
-        broadcaster_name_raw = clip.get("broadcaster_name", "Streamer inconnu")
+    abandoned = {clip.id for clip in clips if is_abandoned(state.get(clip.id))}
 
-        clip_title_escaped = ffmpeg_escape_string(clip_title_raw)
-        broadcaster_name_escaped = ffmpeg_escape_string(broadcaster_name_raw)
+    # Puis cache persistant : un clip déjà prétraité avec les mêmes paramètres n'est ni téléchargé ni réencodé,
+    # et un clip déjà téléchargé n'est que réencodé.
+    to_download, to_encode = [], []
+    for i, clip in enumerate(clips):
+        entry = state.get(clip.id)
+        if clip.id in abandoned:
+            # Clip en échec trop de fois : ignoré, le reste du lot continue
+            results[i] = ClipProcessingError(clip.id, "download", f"abandonné après {entry['attempts']} tentatives ({entry.get('error')})")
+            continue
+        results[i] = restore_result(state, clip)
+        if results[i]:
+            continue
+        raw_output_filename = find_raw_file(state, clip)
+        if raw_output_filename:
+            # Caractéristiques enregistrées au téléchargement ; inconnues pour un fichier repris du cache (clip réencodé)
+            to_encode.append((i, raw_output_filename, entry.get("media_format")))
+        else:
+            to_download.append(i)
+    cached_ids = {result["id"] for result in results if isinstance(result, dict)}
+    cached_count = len(cached_ids)
+    print(f"🗃️ Reprise et cache des clips : {cached_count} prétraités, {len(to_encode)} déjà téléchargés, {len(to_download)} à récupérer"
+          + (f", {len(abandoned)} abandonnés après {MAX_CLIP_ATTEMPTS} tentatives." if abandoned else "."))
 
-        raw_output_filename = os.path.join(RAW_CLIPS_DIR, f"{clip_id}_raw.mp4")
-        processed_output_filename = os.path.join(PROCESSED_CLIPS_DIR, f"{clip_id}_processed.mp4")
-        first_frame_output_path = os.path.join(CLIP_FRAMES_DIR, f"{clip_id}_first_frame.jpg") # Chemin de la frame
+    run_pipeline(state, clips, results, to_download, to_encode)
+    close_downloaders()
 
-        print(f"Téléchargement du clip {i+1}/{len(clips)}: {clip_title_raw} par {broadcaster_name_raw} (ID: {clip_id})...")
+    # Clips abandonnés (avant ou pendant cette exécution) : retirés des prochaines sélections, qui les remplacent
+    abandoned |= {clip.id for clip in clips if is_abandoned(state.get(clip.id))}
+    if abandoned:
         try:
-            # 1. Téléchargement avec yt-dlp
-            yt_dlp_command = [
-                "yt-dlp",
-                "--output", raw_output_filename,
-                "--format", "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best",
-                clip_url
-            ]
-            subprocess.run(yt_dlp_command, check=True)
-            print(f"  ✅ Clip téléchargé: {raw_output_filename}")
-
-            # 2. Prétraitement avec FFmpeg pour normaliser le format, les codecs et ajouter du texte
-            print(f"  Prétraitement du clip {i+1}/{len(clips)}: {clip_title_raw} (ajout du texte)...")
-
-            title_display = clip_title_escaped
-            broadcaster_display = broadcaster_name_escaped
-
-            font_path = "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf"
-            if not os.path.exists(font_path):
-                font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Regular.ttf"
-                if not os.path.exists(font_path):
-                    font_path = "sans-serif" # Generic font family name for FFmpeg
-                    print(f"⚠️ Police spécifique non trouvée. Utilisation d'une police générique '{font_path}'.")
-
-            font_size = 36
-            text_color = "white"
-            border_color = "black"
-            border_width = 2
-
-            title_filter = (
-                f"drawtext=fontfile='{font_path}':"
-                f"text='{title_display}':"
-                f"x=(w-text_w)/2:y=H*0.04:"
-                f"fontcolor={text_color}:fontsize={font_size}:"
-                f"bordercolor={border_color}:borderw={border_width}"
-            )
-
-            broadcaster_filter = (
-                f"drawtext=fontfile='{font_path}':"
-                f"text='{broadcaster_display}':"
-                f"x=(w-text_w)/2:y=H*0.04+text_h+5:"
-                f"fontcolor={text_color}:fontsize={font_size}:"
-                f"bordercolor={border_color}:borderw={border_width}"
-            )
-
-            video_filters = (
-                "scale=1920:1080:force_original_aspect_ratio=decrease,"
-                "pad=1920:1080:(ow-iw)/2:(oh-ih)/2,"
-                "setsar=1,fps=30,"
-                f"{title_filter},"
-                f"{broadcaster_filter}"
-            )
-
-            ffmpeg_preprocess_command = [
-                "ffmpeg",
-                "-i", raw_output_filename,
-                "-vf", video_filters,
-                "-c:v", "libx264",
-                "-preset", "fast",
-                "-crf", "23",
-                "-pix_fmt", "yuv420p",
-                "-c:a", "aac",
-                "-b:a", "192k",
-                "-ac", "2",
-                "-ar", "44100",
-                "-loglevel", "error",
-                "-y",
-                processed_output_filename
-            ]
-            subprocess.run(ffmpeg_preprocess_command, check=True, capture_output=True, text=True)
-            print(f"  ✅ Clip prétraité avec texte: {processed_output_filename}")
-
-            # --- NOUVEAU : Extraire la première frame du clip traité ---
-            print(f"  Extraction de la première frame pour {clip_id}...")
-            ffmpeg_extract_frame_command = [
-                "ffmpeg",
-                "-i", processed_output_filename,
-                "-vframes", "1",
-                "-q:v", "2", # Qualité de sortie (1-31, 1 est le meilleur)
-                "-y",
-                first_frame_output_path
-            ]
-            subprocess.run(ffmpeg_extract_frame_command, check=True, capture_output=True, text=True)
-            print(f"  ✅ Première frame extraite: {first_frame_output_path}")
-            # --- FIN NOUVEAU ---
-
-            actual_duration = get_video_duration(processed_output_filename)
-            print(f"  Durée réelle du clip traité: {actual_duration:.2f} secondes.")
-
-            downloaded_and_processed_info.append({
-                "id": clip_id,
-                "path": processed_output_filename,
-                "duration": actual_duration,
-                "title": clip_title_raw,
-                "broadcaster_name": broadcaster_name_raw,
-                "first_frame_path": first_frame_output_path # Ajoute le chemin de la frame
-            })
-
-        except subprocess.CalledProcessError as e:
-            print(f"  ❌ Erreur lors du traitement du clip {clip_url} (téléchargement ou prétraitement/extraction frame): {e}")
-            if e.stdout: print(f"    STDOUT: {e.stdout}")
-            if e.stderr: print(f"    STDERR: {e.stderr}")
+            mark_clips_unusable(abandoned)
+            print(f"🚫 {len(abandoned)} clips abandonnés marqués comme inutilisables dans l'index local.")
         except Exception as e:
-            print(f"  ❌ Erreur inattendue lors du traitement du clip {clip_url}: {e}")
+            print(f"⚠️ Impossible de marquer les clips abandonnés dans l'index local : {e}")
+
+    # Timecodes : les durées réelles de tous les clips sont connues, aucun timecode n'est incrusté à une position estimée
+    if BURN_TIMECODES:
+        burn_timecodes(clips_per_profile, results)
+    clip_cache.evict_clip_cache()
+    summarize_jobs()
+
+    # Résultats de l'étape (chemin, durée réelle, frame, ou erreur), dans l'ordre de la sélection.
+    # Un échec efface le chemin et la durée d'une exécution précédente : le clip n'est plus prêt pour le rendu
+    failures = [result for result in results if isinstance(result, ClipProcessingError)]
+    downloaded_and_processed_info = [
+        {"id": result.clip_id, "path": None, "media_duration": 0.0, "error": str(result)} if isinstance(result, ClipProcessingError) else result
+        for result in results
+    ]
+    if failures:
+        print(f"\n⚠️ {len(failures)} clip(s) en échec sur {len(clips)} :")
+        for failure in failures:
+            print(f"  ❌ {failure.clip_id} [{failure.stage}] {failure.message}")
+
+    # Chaque manifeste reçoit les résultats de ses propres clips
+    results_by_id = {info["id"]: info for info in downloaded_and_processed_info}
+    for profile, profile_clips in clips_per_profile.items():
+        append_stage("download", [results_by_id[clip.id] for clip in profile_clips if clip.id in results_by_id], manifest_path(profile))
 
-    with open(os.path.join("data", "downloaded_clip_paths.json"), "w", encoding="utf-8") as f:
-        json.dump(downloaded_and_processed_info, f, ensure_ascii=False, indent=2)
+    # Mesures du rapport d'exécution
+    encode_jobs = [job for job in job_records if job.label.startswith("prétraitement")]
+    encode_wall = sum(job.wall_seconds for job in encode_jobs)
+    bytes_written = sum(
+        os.path.getsize(path)
+        for result in results
+        if isinstance(result, dict) and result["id"] not in cached_ids
+        for path in (result["path"], result["first_frame_path"]) if os.path.exists(path)
+    )
+    add_metrics(
+        clips_processed=len(clips) - len(failures),
+        clips_failed=len(failures),
+        cache_hits=len(cached_ids),
+        passthrough_clips=sum(1 for result in results if isinstance(result, dict) and result.get("passthrough")),
+        downloads=transfer_stats["downloads"],
+        streams=transfer_stats["streams"],
+        bytes_read=transfer_stats["bytes_read"],
+        bytes_written=bytes_written,
+        download_seconds=round(transfer_stats["seconds"], 3),
+        download_throughput_mbps=round(transfer_stats["bytes_read"] * 8 / 1e6 / transfer_stats["seconds"], 2) if transfer_stats["seconds"] else None,
+        encode_seconds=round(encode_wall, 3),
+        encode_speed=round(sum(job.out_time for job in encode_jobs) / encode_wall, 2) if encode_wall else None,
+    )
 
     print("✅ Téléchargement et prétraitement des clips terminé.")
 
 if __name__ == "__main__":
-    download_clips()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Télécharge et prétraite les clips sélectionnés.")
+    parser.add_argument("--profiles", nargs="+", help="Profils à traiter (par défaut : tous les manifestes présents).")
+    args = parser.parse_args()
+    with stage_report("download_clips"):
+        download_clips(args.profiles)
\ No newline at end of file
@@ -0,0 +1,150 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+from collections import deque
+from dataclasses import dataclass, field
+
+# Exécution commune des commandes FFmpeg / ffprobe de toutes les étapes :
+# - budget global de threads : une commande ne démarre que si les threads qu'elle annonce sont disponibles ;
+# - progression FFmpeg lue en direct (`-progress pipe:1` : fps, vitesse, temps écrit) ;
+# - stderr conservé en partie seulement (dernières lignes), pour les messages d'erreur ;
+# - temps réel, temps CPU et mémoire maximale (RSS) de chaque commande.
+
+CPU_COUNT = os.cpu_count() or 1
+
+# Threads utilisables simultanément par l'ensemble des commandes FFmpeg du processus
+FFMPEG_THREAD_BUDGET = int(os.getenv("FFMPEG_THREAD_BUDGET", CPU_COUNT))
+
+# Lignes de stderr conservées pour le message d'erreur
+STDERR_TAIL_LINES = 50
+
+# Une commande longue affiche sa progression au plus une fois par intervalle
+PROGRESS_LOG_INTERVAL_SECONDS = 15
+
+class ThreadBudget:
+    """Sémaphore pondéré : chaque commande réserve le nombre de threads qu'elle utilise."""
+    def __init__(self, total):
+        self.total = max(1, total)
+        self.available = self.total
+        self._condition = threading.Condition()
+
+    def acquire(self, threads):
+        threads = min(max(threads, 0), self.total)
+        with self._condition:
+            self._condition.wait_for(lambda: self.available >= threads)
+            self.available -= threads
+        return threads
+
+    def release(self, threads):
+        with self._condition:
+            self.available += threads
+            self._condition.notify_all()
+
+THREAD_BUDGET = ThreadBudget(FFMPEG_THREAD_BUDGET)
+
+@dataclass(slots=True)
+class JobRecord:
+    """Bilan d'une commande FFmpeg / ffprobe."""
+    label: str
+    returncode: int = None
+    wall_seconds: float = 0.0
+    cpu_seconds: float = None # Utilisateur + système, si la plateforme le permet (os.wait4)
+    peak_rss_mb: float = None
+    out_time: float = 0.0 # Durée écrite par FFmpeg (dernière valeur de out_time_us, sans la durée du dernier paquet)
+    speed: float = None # Vitesse d'encodage (x temps réel), dernière valeur rapportée
+    fps: float = None
+    stdout: str = ""
+    stderr_tail: str = ""
+    progress: dict = field(default_factory=dict) # Dernier bloc de progression complet
+
+_records_lock = threading.Lock()
+job_records = []
+
+def _parse_float(value):
+    try:
+        return float(value.rstrip("x"))
+    except (AttributeError, ValueError):
+        return None
+
+def _read_stderr(stream, tail):
+    for line in stream:
+        tail.append(line.rstrip("\n"))
+
+def _wait(process):
+    """Attend la fin du processus ; retourne (code de retour, temps CPU, RSS max en Mo) de ce processus seul."""
+    if not hasattr(os, "wait4"):
+        return process.wait(), None, None
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss est en kilo-octets sous Linux, en octets sous macOS
+    peak_rss = usage.ru_maxrss / 1024 ** 2 if sys.platform == "darwin" else usage.ru_maxrss / 1024
+    return process.returncode, usage.ru_utime + usage.ru_stime, peak_rss
+
+def run_job(command, threads=1, label=None, check=True):
+    """
+    Exécute une commande FFmpeg ou ffprobe dans le budget de threads et retourne son JobRecord.
+    Pour FFmpeg, la progression est demandée sur stdout et suivie en direct. Lève subprocess.CalledProcessError
+    (avec les dernières lignes de stderr) si `check` et que la commande échoue.
+    """
+    is_ffmpeg = os.path.basename(command[0]).startswith("ffmpeg")
+    if is_ffmpeg:
+        command = [command[0], "-progress", "pipe:1", "-nostats", *command[1:]]
+    record = JobRecord(label or os.path.basename(command[-1]))
+    reserved = THREAD_BUDGET.acquire(threads)
+    try:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   text=True, encoding="utf-8", errors="replace")
+        tail = deque(maxlen=STDERR_TAIL_LINES)
+        stderr_thread = threading.Thread(target=_read_stderr, args=(process.stderr, tail), daemon=True)
+        stderr_thread.start()
+
+        stdout_lines = []
+        block = {}
+        last_log = start
+        for line in process.stdout:
+            if not is_ffmpeg:
+                stdout_lines.append(line)
+                continue
+            key, _, value = line.strip().partition("=")
+            block[key] = value
+            if key != "progress":
+                continue
+            # Fin d'un bloc de progression
+            record.progress = block
+            if block.get("out_time_us", "").isdigit():
+                record.out_time = int(block["out_time_us"]) / 1_000_000
+            record.speed = _parse_float(block.get("speed")) or record.speed
+            record.fps = _parse_float(block.get("fps")) or record.fps
+            block = {}
+            now = time.perf_counter()
+            if value == "continue" and now - last_log >= PROGRESS_LOG_INTERVAL_SECONDS:
+                last_log = now
+                print(f"  ⏳ {record.label} : {record.out_time:.1f}s écrites, {record.fps or 0:.0f} i/s, x{record.speed or 0:.2f}")
+
+        record.returncode, record.cpu_seconds, record.peak_rss_mb = _wait(process)
+        record.wall_seconds = time.perf_counter() - start
+        stderr_thread.join()
+        record.stdout = "".join(stdout_lines)
+        record.stderr_tail = "\n".join(tail)
+    finally:
+        THREAD_BUDGET.release(reserved)
+
+    with _records_lock:
+        job_records.append(record)
+    if check and record.returncode != 0:
+        raise subprocess.CalledProcessError(record.returncode, command, output=record.stdout, stderr=record.stderr_tail)
+    return record
+
+def summarize_jobs(records=None):
+    """Affiche le total des commandes exécutées : temps réel et CPU cumulés, RSS maximale."""
+    with _records_lock:
+        records = list(job_records if records is None else records)
+    if not records:
+        return
+    wall = sum(record.wall_seconds for record in records)
+    cpu = sum(record.cpu_seconds or 0 for record in records)
+    peak_rss = max((record.peak_rss_mb or 0 for record in records), default=0)
+    print(f"⏱️ {len(records)} commandes FFmpeg/ffprobe : {wall:.1f}s cumulées, CPU {cpu:.1f}s, RSS max {peak_rss:.0f} Mo.")
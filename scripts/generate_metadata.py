@@ -1,10 +1,14 @@
 import os
+import sys
 import json
+import argparse
 from datetime import datetime, timedelta # datetime est déjà importé, mais je le remets pour clarté
 import locale # Pour le formatage de la date en français
 
+from run_report import add_metrics, stage_report
+from clip_manifest import DEFAULT_PROFILE, manifest_path, profile_path, load_ready_clips
+
 # --- Chemins des fichiers ---
-DOWNLOADED_CLIPS_INFO_JSON = os.path.join("data", "downloaded_clip_paths.json") # Nouvelle source
 OUTPUT_METADATA_JSON = os.path.join("data", "video_metadata.json")
 
 # --- Paramètres de la vidéo YouTube ---
@@ -21,8 +25,10 @@ def format_duration(seconds):
     seconds = int(seconds % 60)
     return f"{hours:02}:{minutes:02}:{seconds:02}"
 
-def generate_metadata():
-    print("📝 Génération des métadonnées vidéo (titre, description, tags)...")
+def generate_metadata(profile=DEFAULT_PROFILE):
+    print(f"📝 Génération des métadonnées vidéo (titre, description, tags) du profil {profile}...")
+    output_metadata_json = profile_path(OUTPUT_METADATA_JSON, profile)
+    clips_manifest_path = manifest_path(profile)
 
     # Tenter de définir la locale pour le français pour le formatage de la date
     try:
@@ -34,31 +40,30 @@ def generate_metadata():
             print("⚠️ Impossible de définir la locale française pour la date. La date sera en anglais.")
 
 
-    if not os.path.exists(DOWNLOADED_CLIPS_INFO_JSON):
-        print(f"❌ Fichier des informations de clips téléchargés '{DOWNLOADED_CLIPS_INFO_JSON}' introuvable.")
+    if not os.path.exists(clips_manifest_path):
+        print(f"❌ Manifeste des clips '{clips_manifest_path}' introuvable.")
         print("Impossible de générer les métadonnées sans les clips.")
         # Créer un fichier de métadonnées vide pour éviter l'échec des étapes suivantes
         # Le titre par défaut sera plus générique dans ce cas
         default_title = f"Compilation Twitch FR du {datetime.now().strftime('%d/%m/%Y')}"
-        with open(OUTPUT_METADATA_JSON, "w", encoding="utf-8") as f:
+        with open(output_metadata_json, "w", encoding="utf-8") as f:
             json.dump({"title": default_title, "description": "Aucun clip disponible pour cette compilation.", "tags": VIDEO_TAGS}, f, ensure_ascii=False, indent=2)
         sys.exit(1) # Quitte avec une erreur car l'entrée principale manque
 
-    # Charger les informations des clips téléchargés (qui incluent la durée réelle)
-    with open(DOWNLOADED_CLIPS_INFO_JSON, "r", encoding="utf-8") as f:
-        downloaded_clips_info = json.load(f)
+    # Charger les clips téléchargés (qui incluent la durée réelle) depuis le manifeste
+    downloaded_clips_info = load_ready_clips(clips_manifest_path)
 
     if not downloaded_clips_info:
         print("⚠️ Aucune information de clip téléchargée disponible pour générer les métadonnées.")
         # Créer un fichier de métadonnées vide
         default_title = f"Compilation Twitch FR du {datetime.now().strftime('%d/%m/%Y')}"
-        with open(OUTPUT_METADATA_JSON, "w", encoding="utf-8") as f:
+        with open(output_metadata_json, "w", encoding="utf-8") as f:
             json.dump({"title": default_title, "description": "Aucun clip disponible pour cette compilation.", "tags": VIDEO_TAGS}, f, ensure_ascii=False, indent=2)
         return # Retourne sans erreur car le fichier est vide, pas manquant
 
     # --- Construction du titre de la vidéo ---
     # Récupérer le titre du premier clip
-    first_clip_title = downloaded_clips_info[0].get("title", "Clips Twitch")
+    first_clip_title = downloaded_clips_info[0].title
     
     # Formater la date en français
     current_date_fr = datetime.now().strftime("%d %B") # Ex: "03 juillet"
@@ -78,12 +83,10 @@ def generate_metadata():
 
     current_offset = 0.0
     for clip_info in downloaded_clips_info:
-        # Utilise la durée réelle du clip stockée dans downloaded_clips_info
-        clip_duration = clip_info.get("duration", 0.0)
-        
-        # Assurez-vous que le titre et le nom du streamer sont disponibles
-        clip_title = clip_info.get("title", "Clip inconnu")
-        broadcaster_name = clip_info.get("broadcaster_name", "Streamer inconnu")
+        # Utilise la durée réelle du clip prétraité
+        clip_duration = clip_info.media_duration
+        clip_title = clip_info.title
+        broadcaster_name = clip_info.broadcaster_name
 
         # Formatage du timecode et ajout à la description
         timecode = format_duration(current_offset)
@@ -107,18 +110,23 @@ def generate_metadata():
         "tags": VIDEO_TAGS
     }
 
-    output_dir = os.path.dirname(OUTPUT_METADATA_JSON)
+    output_dir = os.path.dirname(output_metadata_json)
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    with open(OUTPUT_METADATA_JSON, "w", encoding="utf-8") as f:
+    with open(output_metadata_json, "w", encoding="utf-8") as f:
         json.dump(video_metadata, f, ensure_ascii=False, indent=2)
 
-    print(f"✅ Métadonnées générées et sauvegardées dans {OUTPUT_METADATA_JSON}.")
+    add_metrics(clips_processed=len(downloaded_clips_info), bytes_written=os.path.getsize(output_metadata_json))
+    print(f"✅ Métadonnées générées et sauvegardées dans {output_metadata_json}.")
     print(f"Titre: {video_title}")
     print(f"Description (extrait):\n{video_description[:500]}...") # Affiche un extrait
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère le titre, la description et les tags de la vidéo d'un profil.")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="Profil de compilation (voir COMPILATION_PROFILES dans get_top_clips.py).")
+    args = parser.parse_args()
     # Importation locale pour main, mais datetime est déjà importé en haut
     # from datetime import datetime # Cette ligne n'est plus nécessaire ici
-    generate_metadata()
\ No newline at end of file
+    with stage_report("generate_metadata", args.profile):
+        generate_metadata(args.profile)
\ No newline at end of file
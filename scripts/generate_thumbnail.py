@@ -1,11 +1,13 @@
 import os
-import json
+import argparse
 from PIL import Image, ImageDraw, ImageFont, UnidentifiedImageError # requests et BytesIO ne sont plus nécessaires
 from datetime import datetime
 
+from run_report import add_metrics, stage_report
+from clip_manifest import DEFAULT_PROFILE, manifest_path, profile_path, load_ready_clips
+
 # Chemins des fichiers
-# INPUT_CLIPS_JSON n'est plus la source directe, on utilise downloaded_clip_paths.json
-DOWNLOADED_CLIPS_INFO_JSON = os.path.join("data", "downloaded_clip_paths.json")
+# Les chemins des frames viennent du manifeste des clips (data/clip_manifest.jsonl)
 OUTPUT_THUMBNAIL_PATH = os.path.join("data", "thumbnail.jpg") # Miniature finale
 LOGO_PATH = os.path.join("assets", "your_logo.png") # Chemin vers votre logo PNG
 
@@ -34,35 +36,36 @@ def get_font(size):
 # def download_image(url):
 #     # ... (supprimer cette fonction)
 
-def generate_thumbnail():
-    print("🏞️ Démarrage de la génération de la miniature personnalisée...")
+def generate_thumbnail(profile=DEFAULT_PROFILE):
+    print(f"🏞️ Démarrage de la génération de la miniature personnalisée du profil {profile}...")
+    output_thumbnail_path = profile_path(OUTPUT_THUMBNAIL_PATH, profile)
+    clips_manifest_path = manifest_path(profile)
 
-    data_dir = os.path.dirname(OUTPUT_THUMBNAIL_PATH)
+    data_dir = os.path.dirname(output_thumbnail_path)
     if not os.path.exists(data_dir):
         os.makedirs(data_dir)
         print(f"Dossier de données créé : {data_dir}")
 
-    # Utiliser DOWNLOADED_CLIPS_INFO_JSON comme source
-    if not os.path.exists(DOWNLOADED_CLIPS_INFO_JSON):
-        print(f"❌ Erreur: Le fichier '{DOWNLOADED_CLIPS_INFO_JSON}' est introuvable. Assurez-vous que la compilation a réussi et a sauvegardé les chemins des frames.")
-        generate_default_thumbnail("Fichier de clips introuvable pour la miniature.")
+    # Utiliser le manifeste comme source
+    if not os.path.exists(clips_manifest_path):
+        print(f"❌ Erreur: Le manifeste '{clips_manifest_path}' est introuvable. Assurez-vous que la compilation a réussi et a sauvegardé les chemins des frames.")
+        generate_default_thumbnail("Fichier de clips introuvable pour la miniature.", output_thumbnail_path)
         return 
 
-    with open(DOWNLOADED_CLIPS_INFO_JSON, "r", encoding="utf-8") as f:
-        clips_data = json.load(f)
+    clips_data = load_ready_clips(clips_manifest_path)
 
     today_date = datetime.now()
     date_str = today_date.strftime("%d/%m/%Y")
 
     if not clips_data:
-        print("⚠️ Aucune donnée de clip à traiter. Le fichier downloaded_clip_paths.json est vide. Génération d'une miniature par défaut.")
-        generate_default_thumbnail(f"Aucun clip trouvé pour aujourd'hui ({date_str}).")
+        print("⚠️ Aucune donnée de clip à traiter. Aucun clip téléchargé dans le manifeste. Génération d'une miniature par défaut.")
+        generate_default_thumbnail(f"Aucun clip trouvé pour aujourd'hui ({date_str}).", output_thumbnail_path)
         return 
 
     # Sélectionner les chemins des 4 premières frames disponibles
     selected_frame_paths = []
     for clip in clips_data:
-        frame_path = clip.get("first_frame_path")
+        frame_path = clip.first_frame_path
         if frame_path and os.path.exists(frame_path): # Vérifier que le chemin existe bien sur le disque
             selected_frame_paths.append(frame_path)
         if len(selected_frame_paths) >= 4:
@@ -70,7 +73,7 @@ def generate_thumbnail():
 
     if not selected_frame_paths:
         print("⚠️ Aucune frame de vignette disponible ou les chemins sont invalides. Impossible de créer la miniature basée sur les clips. Génération d'une miniature par défaut.")
-        generate_default_thumbnail(f"Aucune frame disponible pour la miniature ({date_str}).")
+        generate_default_thumbnail(f"Aucune frame disponible pour la miniature ({date_str}).", output_thumbnail_path)
         return 
 
     # Créer l'image finale vide
@@ -123,12 +126,13 @@ def generate_thumbnail():
 
     # Sauvegarder la miniature finale
     try:
-        final_image.save(OUTPUT_THUMBNAIL_PATH)
-        print(f"✅ Miniature générée et sauvegardée avec succès dans {OUTPUT_THUMBNAIL_PATH}")
+        final_image.save(output_thumbnail_path)
+        add_metrics(clips_processed=len(clips_data), bytes_written=os.path.getsize(output_thumbnail_path))
+        print(f"✅ Miniature générée et sauvegardée avec succès dans {output_thumbnail_path}")
     except Exception as e:
         print(f"❌ Erreur lors de la sauvegarde de la miniature finale : {e}")
 
-def generate_default_thumbnail(message):
+def generate_default_thumbnail(message, output_thumbnail_path=OUTPUT_THUMBNAIL_PATH):
     """Génère une miniature par défaut avec un message."""
     print(f"Génération d'une miniature par défaut : {message}")
     default_thumbnail = Image.new('RGB', (THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT), color = 'black')
@@ -142,10 +146,14 @@ def generate_default_thumbnail(message):
     draw.text(((THUMBNAIL_WIDTH - text_width) / 2, (THUMBNAIL_HEIGHT - text_height) / 2), message, font=font, fill=(255, 255, 255))
     
     try:
-        default_thumbnail.save(OUTPUT_THUMBNAIL_PATH)
-        print(f"✅ Miniature par défaut générée et sauvegardée dans {OUTPUT_THUMBNAIL_PATH}.")
+        default_thumbnail.save(output_thumbnail_path)
+        print(f"✅ Miniature par défaut générée et sauvegardée dans {output_thumbnail_path}.")
     except Exception as e:
         print(f"❌ Erreur lors de la sauvegarde de la miniature par défaut : {e}")
 
 if __name__ == "__main__":
-    generate_thumbnail()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Génère la miniature de la vidéo d'un profil.")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="Profil de compilation (voir COMPILATION_PROFILES dans get_top_clips.py).")
+    args = parser.parse_args()
+    with stage_report("generate_thumbnail", args.profile):
+        generate_thumbnail(args.profile)
\ No newline at end of file
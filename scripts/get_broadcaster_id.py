@@ -2,6 +2,8 @@ import requests
 import os
 import sys
 import json # Import pour afficher la réponse si besoin
+import argparse
+from twitch_auth import TWITCH_API_BASE_URL, get_twitch_access_token, twitch_api_get
 
 # Récupérer les identifiants Twitch depuis les variables d'environnement
 CLIENT_ID = os.getenv("TWITCH_CLIENT_ID")
@@ -12,40 +14,28 @@ if not CLIENT_ID or not CLIENT_SECRET:
     print("Veuillez les définir avant d'exécuter ce script (par exemple, 'export TWITCH_CLIENT_ID=votre_id').")
     sys.exit(1)
 
-TWITCH_AUTH_URL = "https://id.twitch.tv/oauth2/token"
-TWITCH_USERS_API_URL = "https://api.twitch.tv/helix/users"
+TWITCH_USERS_API_URL = f"{TWITCH_API_BASE_URL}/users"
+TWITCH_GAMES_API_URL = f"{TWITCH_API_BASE_URL}/games"
 
-def get_twitch_access_token():
-    """Récupère un jeton d'accès d'application pour l'API Twitch."""
-    print("🔑 Tentative de récupération du jeton d'accès Twitch...")
-    payload = {
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "grant_type": "client_credentials"
-    }
-    try:
-        response = requests.post(TWITCH_AUTH_URL, data=payload)
-        response.raise_for_status() # Lève une exception pour les codes d'état HTTP d'erreur (4xx ou 5xx)
-        token_data = response.json()
-        print("✅ Jeton d'accès Twitch récupéré.")
-        return token_data["access_token"]
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Erreur lors de la récupération du jeton d'accès Twitch : {e}")
-        sys.exit(1)
+# Nombre maximal de logins/noms/IDs acceptés par requête sur /helix/users et /helix/games
+HELIX_BATCH_SIZE = 100
+
+# Cache disque des résolutions login -> ID et nom de jeu -> ID
+ID_CACHE_PATH = os.path.join(".cache", "twitch_ids.json")
+
+# Préfixe marquant un nom de jeu dans un fichier de résolution (les autres lignes sont des logins)
+GAME_LINE_PREFIX = "game:"
 
-def get_broadcaster_id(access_token, streamer_login):
+def get_broadcaster_id(streamer_login):
     """Récupère l'ID d'un streamer Twitch à partir de son nom d'utilisateur (login)."""
-    headers = {
-        "Client-ID": CLIENT_ID,
-        "Authorization": f"Bearer {access_token}"
-    }
     params = {
         "login": streamer_login
     }
 
     print(f"🔍 Recherche de l'ID pour le streamer : '{streamer_login}'...")
+    response = None
     try:
-        response = requests.get(TWITCH_USERS_API_URL, headers=headers, params=params)
+        response = twitch_api_get(TWITCH_USERS_API_URL, params)
         response.raise_for_status()
         user_data = response.json()
 
@@ -60,7 +50,7 @@ def get_broadcaster_id(access_token, streamer_login):
             return None
     except requests.exceptions.RequestException as e:
         print(f"❌ Erreur lors de la requête API Twitch pour '{streamer_login}' : {e}")
-        if response.content:
+        if response is not None and response.content:
             print(f"    Contenu de la réponse API: {response.content.decode()}")
         return None
     except json.JSONDecodeError as e:
@@ -69,17 +59,184 @@ def get_broadcaster_id(access_token, streamer_login):
             print(f"    Contenu brut de la réponse: {response.content.decode()}")
         return None
 
-if __name__ == "__main__":
-    token = get_twitch_access_token()
-    if token:
-        # Demande à l'utilisateur d'entrer le nom du streamer
-        streamer_name = input("Entrez le nom d'utilisateur (login) du streamer Twitch : ").strip()
-        
-        if streamer_name:
-            broadcaster_id = get_broadcaster_id(token, streamer_name)
+def load_id_cache():
+    """Charge le cache login/jeu -> ID, ou un cache vide s'il n'existe pas encore."""
+    try:
+        with open(ID_CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    cache.setdefault("users", {})
+    cache.setdefault("games", {})
+    return cache
+
+def save_id_cache(cache):
+    os.makedirs(os.path.dirname(ID_CACHE_PATH), exist_ok=True)
+    temp_path = f"{ID_CACHE_PATH}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, ID_CACHE_PATH)
+
+def helix_get_batched(url, key, values):
+    """
+    Interroge un endpoint Helix par lots de HELIX_BATCH_SIZE valeurs (paramètre `key` répété).
+    Retourne la liste concaténée des entrées `data` ; les lots en erreur sont ignorés.
+    """
+    results = []
+    for start in range(0, len(values), HELIX_BATCH_SIZE):
+        batch = values[start:start + HELIX_BATCH_SIZE]
+        response = None
+        try:
+            response = twitch_api_get(url, [(key, value) for value in batch])
+            response.raise_for_status()
+            results.extend(response.json().get("data", []))
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Erreur lors de la requête API Twitch sur {url} ({len(batch)} valeurs) : {e}")
+            if response is not None and response.content:
+                print(f"    Contenu de la réponse API: {response.content.decode()}")
+    return results
+
+def resolve_logins(logins, cache):
+    """Résout une liste de logins en IDs ; seuls les logins absents du cache sont demandés à Twitch."""
+    missing = sorted({login.lower() for login in logins} - cache["users"].keys())
+    if missing:
+        print(f"🔍 Résolution de {len(missing)} login(s) en {-(-len(missing) // HELIX_BATCH_SIZE)} requête(s)...")
+        for user in helix_get_batched(TWITCH_USERS_API_URL, "login", missing):
+            cache["users"][user["login"].lower()] = user["id"]
+    return {login: cache["users"].get(login.lower()) for login in logins}
+
+def resolve_game_names(game_names, cache):
+    """Résout une liste de noms de jeux en IDs ; seuls les noms absents du cache sont demandés à Twitch."""
+    missing = sorted({name.lower(): name for name in game_names if name.lower() not in cache["games"]}.values())
+    if missing:
+        print(f"🔍 Résolution de {len(missing)} jeu(x) en {-(-len(missing) // HELIX_BATCH_SIZE)} requête(s)...")
+        for game in helix_get_batched(TWITCH_GAMES_API_URL, "name", missing):
+            cache["games"][game["name"].lower()] = game["id"]
+    return {name: cache["games"].get(name.lower()) for name in game_names}
+
+def read_names_file(path):
+    """
+    Lit un fichier de résolution : un login par ligne, ou `game:Nom du jeu` pour un jeu.
+    Les lignes vides et les commentaires (#) sont ignorés.
+    """
+    logins, game_names = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.lower().startswith(GAME_LINE_PREFIX):
+                game_names.append(line[len(GAME_LINE_PREFIX):].strip())
+            else:
+                logins.append(line)
+    return logins, game_names
+
+def resolve_names_file(path):
+    """Résout tout un fichier de logins et de jeux en quelques requêtes groupées."""
+    logins, game_names = read_names_file(path)
+    cache = load_id_cache()
+    resolved_logins = resolve_logins(logins, cache)
+    resolved_games = resolve_game_names(game_names, cache)
+    save_id_cache(cache)
+
+    unresolved = 0
+    if resolved_logins:
+        print("\n# À ajouter à BROADCASTER_IDS dans get_top_clips.py")
+        for login, broadcaster_id in resolved_logins.items():
             if broadcaster_id:
-                print(f"\nVous pouvez ajouter cet ID à votre liste BROADCASTER_IDS dans get_top_clips.py : '{broadcaster_id}'")
+                print(f'    "{broadcaster_id}",{" " * max(1, 14 - len(broadcaster_id))}# {login}')
+            else:
+                unresolved += 1
+                print(f"    # ⚠️ Aucun streamer trouvé avec le login '{login}'")
+    if resolved_games:
+        print("\n# À ajouter à GAME_IDS dans get_top_clips.py")
+        for name, game_id in resolved_games.items():
+            if game_id:
+                print(f'    "{game_id}",{" " * max(1, 14 - len(game_id))}# {name}')
             else:
-                print("\nImpossible de récupérer l'ID du streamer. Assurez-vous que le nom est correct.")
+                unresolved += 1
+                print(f"    # ⚠️ Aucun jeu trouvé avec le nom '{name}'")
+    return unresolved == 0
+
+def find_duplicates(ids):
+    """Retourne {id: [positions]} pour chaque ID présent plusieurs fois dans la liste."""
+    positions = {}
+    for index, value in enumerate(ids):
+        positions.setdefault(value, []).append(index)
+    return {value: indexes for value, indexes in positions.items() if len(indexes) > 1}
+
+def validate_config_ids():
+    """
+    Vérifie les listes BROADCASTER_IDS et GAME_IDS de get_top_clips.py :
+    doublons (requêtes gaspillées à chaque exécution) et IDs inconnus de Twitch.
+    """
+    from get_top_clips import BROADCASTER_IDS, GAME_IDS
+
+    is_valid = True
+    for list_name, ids in (("BROADCASTER_IDS", BROADCASTER_IDS), ("GAME_IDS", GAME_IDS)):
+        for value, indexes in find_duplicates(ids).items():
+            is_valid = False
+            print(f"⚠️ {list_name}: '{value}' apparaît {len(indexes)} fois (entrées n° {', '.join(str(index + 1) for index in indexes)}).")
+
+    cache = load_id_cache()
+    unique_broadcaster_ids = list(dict.fromkeys(BROADCASTER_IDS))
+    users = helix_get_batched(TWITCH_USERS_API_URL, "id", unique_broadcaster_ids)
+    for user in users:
+        cache["users"][user["login"].lower()] = user["id"]
+    known_user_ids = {user["id"]: user["login"] for user in users}
+
+    unique_game_ids = list(dict.fromkeys(GAME_IDS))
+    games = helix_get_batched(TWITCH_GAMES_API_URL, "id", unique_game_ids)
+    for game in games:
+        cache["games"][game["name"].lower()] = game["id"]
+    known_game_ids = {game["id"]: game["name"] for game in games}
+    save_id_cache(cache)
+
+    print("\n--- BROADCASTER_IDS ---")
+    for broadcaster_id in unique_broadcaster_ids:
+        if broadcaster_id in known_user_ids:
+            print(f"  ✅ {broadcaster_id}: {known_user_ids[broadcaster_id]}")
+        else:
+            is_valid = False
+            print(f"  ❌ {broadcaster_id}: aucun streamer Twitch avec cet ID")
+    print("\n--- GAME_IDS ---")
+    for game_id in unique_game_ids:
+        if game_id in known_game_ids:
+            print(f"  ✅ {game_id}: {known_game_ids[game_id]}")
         else:
-            print("Aucun nom de streamer n'a été entré.")
\ No newline at end of file
+            is_valid = False
+            print(f"  ❌ {game_id}: aucun jeu Twitch avec cet ID")
+
+    print("\n✅ Configuration valide." if is_valid else "\n⚠️ La configuration contient des doublons ou des IDs inconnus.")
+    return is_valid
+
+def prompt_for_broadcaster_id():
+    """Mode interactif historique : résout un seul login saisi au clavier."""
+    # Demande à l'utilisateur d'entrer le nom du streamer
+    streamer_name = input("Entrez le nom d'utilisateur (login) du streamer Twitch : ").strip()
+
+    if streamer_name:
+        broadcaster_id = get_broadcaster_id(streamer_name)
+        if broadcaster_id:
+            print(f"\nVous pouvez ajouter cet ID à votre liste BROADCASTER_IDS dans get_top_clips.py : '{broadcaster_id}'")
+        else:
+            print("\nImpossible de récupérer l'ID du streamer. Assurez-vous que le nom est correct.")
+    else:
+        print("Aucun nom de streamer n'a été entré.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Résout des logins/jeux Twitch en IDs et valide la configuration.")
+    parser.add_argument("--file", help="Fichier de logins (un par ligne) et de jeux (lignes 'game:Nom du jeu') à résoudre en lot.")
+    parser.add_argument("--validate", action="store_true", help="Vérifie BROADCASTER_IDS et GAME_IDS de get_top_clips.py (doublons, IDs inconnus).")
+    args = parser.parse_args()
+
+    token = get_twitch_access_token()
+    if token:
+        if args.validate or args.file:
+            success = True
+            if args.file:
+                success = resolve_names_file(args.file) and success
+            if args.validate:
+                success = validate_config_ids() and success
+            sys.exit(0 if success else 1)
+        prompt_for_broadcaster_id()
\ No newline at end of file
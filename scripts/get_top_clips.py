@@ -2,7 +2,18 @@ import requests
 import os
 import json
 import sys
+import heapq
+import argparse
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
+from twitch_auth import TWITCH_API_BASE_URL, api_stats, get_twitch_access_token, twitch_api_get
+import clip_index
+from clip_selection import select_clips
+from clip_manifest import DEFAULT_PROFILE, manifest_path, write_manifest
+from run_report import add_metrics, stage_report
 
 # Twitch API credentials from GitHub Secrets
 CLIENT_ID = os.getenv("TWITCH_CLIENT_ID")
@@ -12,10 +23,52 @@ if not CLIENT_ID or not CLIENT_SECRET:
     print("❌ ERREUR: TWITCH_CLIENT_ID ou TWITCH_CLIENT_SECRET non définis.")
     sys.exit(1)
 
-TWITCH_AUTH_URL = "https://id.twitch.tv/oauth2/token"
-TWITCH_API_URL = "https://api.twitch.tv/helix/clips"
-
-OUTPUT_CLIPS_JSON = os.path.join("data", "top_clips.json")
+TWITCH_API_URL = f"{TWITCH_API_BASE_URL}/clips"
+
+# Nombre de requêtes Helix exécutées en parallèle pendant la phase de collecte.
+# Toutes les requêtes partagent une même session HTTP (connexions TLS réutilisées).
+MAX_FETCH_WORKERS = 8
+
+# Taille des pages Helix suivant la première. Les pages suivantes ne sont lues (via `pagination.cursor`)
+# que si la page précédente contient encore des clips susceptibles d'être sélectionnés.
+# La première page couvre tout le pool du seuil (CUTOFF_CANDIDATE_POOL, dans la limite du budget) : une source
+# qui ne descend jamais sous le seuil ne coûte pas plus de requêtes qu'avec une seule grande page.
+CLIPS_PAGE_SIZE = 20
+
+# Nombre de meilleurs clips (par vues) retenus pour calculer le seuil d'arrêt de la pagination,
+# soit environ deux fois la taille d'une compilation.
+# Une source arrête sa pagination dès qu'une page descend sous le nombre de vues du N-ième
+# meilleur clip déjà vu : ses pages suivantes ne pourraient plus entrer dans la sélection.
+CUTOFF_CANDIDATE_POOL = 60
+
+# Chaque source n'est collectée que depuis sa dernière collecte réussie (watermark enregistré dans
+# l'index local des clips), moins ce recouvrement qui rafraîchit les vues des clips les plus récents.
+WATERMARK_OVERLAP_HOURS = 12
+
+# Les vues d'un clip continuent d'augmenter pendant toute la fenêtre de sélection (`days_ago`) : à chaque exécution,
+# le haut du classement de toute la fenêtre est relu (au plus REFRESH_CLIPS_PER_SOURCE clips, moins si les pages
+# passent sous le seuil de vues) pour les sources déjà collectées dont le meilleur clip indexé atteint au moins
+# REFRESH_CUTOFF_RATIO fois le seuil de vues (celles dont les clips peuvent entrer dans la sélection ou en sortir),
+# par roulement : ces sources sont réparties en REFRESH_GROUPS groupes et un seul groupe est relu par jour.
+# Les autres sources ne demandent que la nouvelle tranche de temps.
+REFRESH_CLIPS_PER_SOURCE = 40
+REFRESH_CUTOFF_RATIO = 0.5
+REFRESH_GROUPS = 3
+
+# Helix ne pagine pas au-delà d'environ HELIX_RESULT_CAP résultats par requête : sur une grosse catégorie,
+# les clips plus récents (encore peu vus) d'une fenêtre de temps ne sont jamais atteints.
+# Une fenêtre est saturée quand sa pagination atteint cette limite alors que les clips restent au-dessus du seuil
+# de vues : une fois le budget de la source lu, la pagination continue donc (pages de HELIX_MAX_PAGE_SIZE clips)
+# tant que les clips restent au-dessus du seuil, jusqu'à la fin du curseur ou jusqu'à la limite.
+# Une fenêtre saturée est coupée en deux sous-fenêtres collectées en parallèle, récursivement, sans descendre
+# sous cette durée. Chaque fenêtre garde ses propres meilleurs clips, dans la limite du budget (budget par
+# fenêtre) : les clips de la fin de la fenêtre atteignent ainsi l'index.
+HELIX_RESULT_CAP = 1000
+HELIX_MAX_PAGE_SIZE = 100
+MIN_FETCH_WINDOW_HOURS = 2
+
+# Compteurs de la collecte (lus par le rapport d'exécution et par benchmark_fetch.py)
+fetch_stats = {"split_windows": 0}
 
 # --- PARAMÈTRES DE FILTRAGE ET DE SÉLECTION ---
 
@@ -24,6 +77,11 @@ OUTPUT_CLIPS_JSON = os.path.join("data", "top_clips.json")
 # Si FALSE, tous les clips (broadcasters et jeux) seront collectés puis triés globalement par vues.
 PRIORITIZE_BROADCASTERS_STRICTLY = False # <-- CHANGEZ CETTE VALEUR (True/False) POUR BASCULER LA LOGIQUE
 
+# Stratégie du moteur de sélection (voir clip_selection.py) : "priority", "classic" ou "knapsack".
+# Par défaut, déduite de PRIORITIZE_BROADCASTERS_STRICTLY. "knapsack" maximise le total des vues
+# pour une durée comprise entre MIN_VIDEO_DURATION_SECONDS et MAX_VIDEO_DURATION_SECONDS.
+SELECTION_STRATEGY = "priority" if PRIORITIZE_BROADCASTERS_STRICTLY else "classic"
+
 # NOUVEAU PARAMÈTRE : Nombre maximal de clips par streamer dans la compilation finale.
 MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION = 3 # Définis ta limite ici (ex: 5, 10, etc.)
 
@@ -35,7 +93,6 @@ GAME_IDS = [
     "512965",        # VALORANT
     "518018",        # Minecraft
     "513143",        # Fortnite
-    "32982",         # Grand Theft Auto V
     "32399",         # Counter-Strike
     "511224",        # Apex Legends
     "506520",        # Dota 2
@@ -69,7 +126,8 @@ BROADCASTER_IDS = [
     "22245231",      # SqueezieLive (sa chaîne secondaire pour le live)
     "80716629",      # Inoxtag
     "153066440",     # Michou
-    "737048563",     # AmineMaTue
+    # AmineMaTue : ID à vérifier avec `python scripts/get_broadcaster_id.py --validate`
+    # (l'ID "737048563" listé ici faisait doublon avec Anyme023)
     "496105401",     # byilhann
     "57402636",      # RebeuDeter
     "887001013",     # Nico_la
@@ -110,40 +168,99 @@ CLIP_LANGUAGE = "fr" # Code ISO 639-1 pour le français
 # PARAMÈTRE POUR LA DURÉE CUMULÉE MINIMALE DE LA VIDÉO FINALE
 MIN_VIDEO_DURATION_SECONDS = 630 # 10 minutes et 30 secondes (10*60 + 30)
 
+# Durée maximale visée par la stratégie "knapsack"
+MAX_VIDEO_DURATION_SECONDS = 900 # 15 minutes
+
+# Nombre maximal de clips dans la compilation (même valeur que MAX_TOTAL_CLIPS dans compile_video.py)
+MAX_TOTAL_CLIPS = 30
+
+# --- PROFILS DE COMPILATION ---
+# Une seule collecte Helix alimente plusieurs compilations. Chaque profil choisit sa langue, ses
+# streamers, ses jeux et sa stratégie de sélection (valeurs par défaut : paramètres ci-dessus) et
+# produit son propre manifeste. Les clips communs à plusieurs profils ne sont téléchargés qu'une fois.
+# Le profil "default" garde les chemins historiques (data/clip_manifest.jsonl, output/compiled_video.mp4),
+# les autres sont suffixés (data/clip_manifest_just_chatting.jsonl, output/compiled_video_just_chatting.mp4...).
+COMPILATION_PROFILES = {
+    DEFAULT_PROFILE: {
+        "language": CLIP_LANGUAGE,
+        "broadcaster_ids": BROADCASTER_IDS,
+        "game_ids": GAME_IDS,
+        "strategy": SELECTION_STRATEGY,
+    },
+    "just_chatting": {
+        "game_ids": ["509670"], # Just Chatting
+        "strategy": "classic",
+    },
+    "best_of_lol": {
+        "game_ids": ["21779"], # League of Legends
+        "strategy": "knapsack",
+    },
+}
+
+# Profils construits quand aucun n'est précisé (python scripts/get_top_clips.py --profiles default just_chatting).
+ENABLED_PROFILES = [DEFAULT_PROFILE]
+
 # --- FIN PARAMÈTRES ---
 
-def get_twitch_access_token():
-    """Gets an application access token for Twitch API."""
-    print("🔑 Récupération du jeton d'accès Twitch...")
-    payload = {
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "grant_type": "client_credentials"
-    }
-    try:
-        response = requests.post(TWITCH_AUTH_URL, data=payload)
-        response.raise_for_status()
-        token_data = response.json()
-        print("✅ Jeton d'accès Twitch récupéré.")
-        return token_data["access_token"]
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Erreur lors de la récupération du jeton d'accès Twitch : {e}")
-        sys.exit(1)
-
-def fetch_clips(access_token, params, source_type, source_id):
-    """Helper function to fetch clips and handle errors."""
-    headers = {
-        "Client-ID": CLIENT_ID,
-        "Authorization": f"Bearer {access_token}"
-    }
+def create_http_session(pool_size=MAX_FETCH_WORKERS):
+    """Crée une session HTTP partagée dont le pool de connexions couvre tous les workers."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+HTTP_SESSION = create_http_session()
+
+class ClipFetchError(Exception):
+    """Une page de clips n'a pas pu être récupérée (erreur HTTP ou JSON déjà affichée)."""
+
+class ViewCountCutoff:
+    """
+    Seuil de vues partagé entre les workers de collecte.
+    Seuls les `per_broadcaster_limit` meilleurs clips de chaque streamer comptent (les autres ne
+    pourront jamais être sélectionnés) ; le seuil est le nombre de vues du `pool_size`-ième
+    meilleur clip retenu, ou 0 tant que le pool n'est pas plein.
+    """
+    def __init__(self, pool_size=CUTOFF_CANDIDATE_POOL, per_broadcaster_limit=MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION):
+        self.pool_size = pool_size
+        self.per_broadcaster_limit = per_broadcaster_limit
+        self._heaps_per_broadcaster = {} # broadcaster_id -> tas min borné des vues
+        self._seen_ids = set()
+        self._lock = threading.Lock()
+
+    def offer(self, clips):
+        with self._lock:
+            for clip in clips:
+                if clip["id"] in self._seen_ids:
+                    continue # Un même clip peut être renvoyé par un streamer et par un jeu
+                self._seen_ids.add(clip["id"])
+                heap = self._heaps_per_broadcaster.setdefault(clip["broadcaster_id"], [])
+                if len(heap) < self.per_broadcaster_limit:
+                    heapq.heappush(heap, clip["viewer_count"])
+                elif clip["viewer_count"] > heap[0]:
+                    heapq.heapreplace(heap, clip["viewer_count"])
+
+    def value(self):
+        with self._lock:
+            best = heapq.nlargest(self.pool_size, (views for heap in self._heaps_per_broadcaster.values() for views in heap))
+        return best[-1] if len(best) >= self.pool_size else 0
+
+def fetch_clips(params, source_type, source_id):
+    """
+    Helper function to fetch one page of clips and handle errors.
+    Retourne (clips, curseur de la page suivante ou None) ; clips vaut None en cas d'erreur.
+    """
+    response = None
     try:
-        response = requests.get(TWITCH_API_URL, headers=headers, params=params)
+        response = twitch_api_get(TWITCH_API_URL, params, session=HTTP_SESSION)
         response.raise_for_status()
         clips_data = response.json()
         
         if not clips_data.get("data"):
-            print(f"  ⚠️ Aucune donnée de clip trouvée pour {source_type} {source_id} dans la période spécifiée.")
-            return []
+            if "after" not in params:
+                print(f"  ⚠️ Aucune donnée de clip trouvée pour {source_type} {source_id} dans la période spécifiée.")
+            return [], None
 
         collected_clips = []
         for clip in clips_data.get("data", []):
@@ -156,188 +273,319 @@ def fetch_clips(access_token, params, source_type, source_id):
                 "viewer_count": clip.get("view_count", 0),
                 "broadcaster_id": clip.get("broadcaster_id"), # Assure-toi que l'ID du streamer est inclus
                 "broadcaster_name": clip.get("broadcaster_name"),
+                "game_id": clip.get("game_id"),
                 "game_name": clip.get("game_name"),
                 "created_at": clip.get("created_at"),
                 "duration": float(clip.get("duration", 0.0)),
                 "language": clip.get("language")
             })
-        return collected_clips
+        next_cursor = clips_data.get("pagination", {}).get("cursor")
+        return collected_clips, next_cursor
             
     except requests.exceptions.RequestException as e:
         print(f"❌ Erreur lors de la récupération des clips Twitch pour {source_type} {source_id} : {e}")
-        if response.content:
+        if response is not None and response.content:
             print(f"    Contenu de la réponse API Twitch: {response.content.decode()}")
-        return []
+        return None, None
     except json.JSONDecodeError as e:
         print(f"❌ Erreur de décodage JSON pour {source_type} {source_id}: {e}")
         if response.content:
             print(f"    Contenu brut de la réponse: {response.content.decode()}")
-        return []
+        return None, None
+
+def iter_clip_pages(params, source_type, source_id, max_clips):
+    """
+    Générateur paresseux sur les pages de clips d'une source, en suivant `pagination.cursor`.
+    S'arrête quand Helix n'a plus de page ou quand HELIX_RESULT_CAP clips ont été lus. Les pages au-delà
+    du budget `max_clips` (détection des fenêtres saturées) sont des pages de HELIX_MAX_PAGE_SIZE clips.
+    Lève ClipFetchError si une page ne peut pas être récupérée.
+    """
+    params = dict(params)
+    read = 0
+    page_size = CUTOFF_CANDIDATE_POOL
+    while read < HELIX_RESULT_CAP:
+        if read < max_clips:
+            params["first"] = min(page_size, max_clips - read)
+        else:
+            params["first"] = min(HELIX_MAX_PAGE_SIZE, HELIX_RESULT_CAP - read)
+        page_size = CLIPS_PAGE_SIZE
+        clips, cursor = fetch_clips(params, source_type, source_id)
+        if clips is None:
+            raise ClipFetchError(f"{source_type} {source_id}")
+        if not clips:
+            return
+        yield clips
+        read += len(clips)
+        if not cursor:
+            return
+        params["after"] = cursor
+
+def fetch_source_clips(params, source_type, source_id, max_clips, cutoff):
+    """
+    Lit les pages d'une source tant qu'elles peuvent encore contribuer à la sélection.
+    Les clips étant triés par vues, on s'arrête dès que le dernier clip d'une page
+    passe sous le seuil courant ; seuls les `max_clips` meilleurs clips sont retournés.
+    Retourne (clips, complete, saturated) ; `complete` est faux si une page a échoué,
+    `saturated` est vrai si la pagination a atteint la limite de résultats de Helix (HELIX_RESULT_CAP)
+    alors que les clips restaient au-dessus du seuil.
+    """
+    collected_clips = []
+    pages_read = 0
+    complete = True
+    below_cutoff = False
+    try:
+        for page in iter_clip_pages(params, source_type, source_id, max_clips):
+            pages_read += 1
+            cutoff.offer(page[:max(0, max_clips - len(collected_clips))]) # Seuls les clips conservés comptent
+            collected_clips.extend(page)
+            if page[-1]["viewer_count"] < cutoff.value():
+                below_cutoff = True
+                break
+    except ClipFetchError:
+        complete = False
+    if pages_read > 1:
+        print(f"  ↪ {source_type} {source_id} [{params['started_at']} → {params['ended_at']}]: {len(collected_clips)} clips lus sur {pages_read} pages.")
+    saturated = complete and not below_cutoff and len(collected_clips) >= HELIX_RESULT_CAP
+    return collected_clips[:max_clips], complete, saturated
+
+def split_window(window):
+    """Coupe une fenêtre (début, fin) en deux, ou retourne None si elle est déjà à la durée minimale."""
+    start, end = window
+    if end - start < timedelta(hours=2 * MIN_FETCH_WINDOW_HOURS):
+        return None
+    middle = start + (end - start) / 2
+    return [(start, middle), (middle, end)]
+
+def fetch_all_sources(tasks, cutoffs):
+    """
+    Récupère les clips de toutes les sources en parallèle sur la session HTTP partagée.
+    `tasks` contient des (source, paramètres Helix, budget de clips), une source (source_type, source_id, langue)
+    pouvant avoir plusieurs tâches (relecture de toute la fenêtre et nouvelle tranche) ; `cutoffs` associe chaque
+    source à son seuil de vues. Les fenêtres saturées sont redécoupées (voir MIN_FETCH_WINDOW_HOURS) et leurs
+    sous-fenêtres ajoutées à la file des workers ; le budget s'applique à chaque fenêtre, et les clips de toutes
+    les fenêtres d'une tâche sont conservés (dédupliqués).
+    Retourne une liste de (clips triés par vues, complete), dans le même ordre que `tasks`.
+    """
+    def fetch_window(task_index, window):
+        (source_type, source_id, language), params, max_clips = tasks[task_index]
+        params = dict(params)
+        if window is None:
+            print(f"  - Recherche de clips pour le {source_type}: {source_id} ({language}, depuis {params['started_at']})")
+            window = (clip_index.parse_helix_date(params["started_at"]), clip_index.parse_helix_date(params["ended_at"]))
+        else:
+            params["started_at"] = clip_index.format_helix_date(window[0])
+            params["ended_at"] = clip_index.format_helix_date(window[1])
+        return window, fetch_source_clips(params, source_type, source_id, max_clips, cutoffs[tasks[task_index][0]])
+
+    clips_per_task = [{} for _ in tasks] # ID -> clip
+    complete = [True for _ in tasks]
+    split_windows = 0
+
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as executor:
+        pending = {executor.submit(fetch_window, task_index, None): task_index for task_index in range(len(tasks))}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_index = pending.pop(future)
+                window, (clips, window_complete, saturated) = future.result()
+                complete[task_index] = complete[task_index] and window_complete
+                for clip in clips:
+                    clips_per_task[task_index].setdefault(clip["id"], clip) # Clip à la frontière de deux sous-fenêtres
+                sub_windows = split_window(window) if saturated else None
+                if sub_windows:
+                    split_windows += 1
+                    for sub_window in sub_windows:
+                        pending[executor.submit(fetch_window, task_index, sub_window)] = task_index
+
+    fetch_stats["split_windows"] += split_windows
+    if split_windows:
+        print(f"  ↪ {split_windows} fenêtres saturées redécoupées en sous-fenêtres.")
+    return [(sorted(clips.values(), key=lambda clip: (clip["viewer_count"], clip["id"]), reverse=True), task_complete)
+            for clips, task_complete in zip(clips_per_task, complete)]
+
+class CombinedCutoff:
+    """Seuil d'une source utilisée par plusieurs profils : sa pagination continue tant qu'un des profils peut encore en profiter."""
+    def __init__(self, cutoffs):
+        self.cutoffs = cutoffs
+
+    def offer(self, clips):
+        for cutoff in self.cutoffs:
+            cutoff.offer(clips)
+
+    def value(self):
+        return min(cutoff.value() for cutoff in self.cutoffs)
+
+def get_profile(name):
+    if name not in COMPILATION_PROFILES:
+        raise ValueError(f"Profil de compilation inconnu : {name} (profils : {', '.join(COMPILATION_PROFILES)})")
+    profile = COMPILATION_PROFILES[name]
+    # Les doublons éventuels des listes sont ignorés (dict.fromkeys conserve l'ordre de priorité).
+    return {
+        "language": profile.get("language", CLIP_LANGUAGE),
+        "broadcaster_ids": list(dict.fromkeys(profile.get("broadcaster_ids", []))),
+        "game_ids": list(dict.fromkeys(profile.get("game_ids", []))),
+        "strategy": profile.get("strategy", SELECTION_STRATEGY),
+    }
 
-def get_top_clips(access_token, num_clips_per_source=50, days_ago=3):    
-    """Fetches and prioritizes clips based on configured parameters, with a limit per broadcaster."""
-    print(f"📊 Récupération d'un maximum de {num_clips_per_source} clips Twitch par source (jeu/streamer) pour les dernières {days_ago} jours...")
+def collect_candidate_clips(num_clips_per_source=50, days_ago=3, profile_names=None):
+    """
+    Phase de collecte : met à jour l'index local depuis Helix puis en extrait les candidats de chaque profil.
+    Une source commune à plusieurs profils n'est collectée qu'une fois.
+    `num_clips_per_source` est un budget maximal : la pagination s'arrête plus tôt si possible.
+    Retourne {profil: (clips_des_streamers, clips_des_jeux)}.
+    """
+    profiles = {name: get_profile(name) for name in (profile_names or ENABLED_PROFILES)}
+    print(f"📊 Récupération d'un maximum de {num_clips_per_source} clips Twitch par source (jeu/streamer) pour les dernières {days_ago} jours ({len(profiles)} profils : {', '.join(profiles)})...")
             
     end_date = datetime.now(timezone.utc)
     start_date = end_date - timedelta(days=days_ago)
     
-    seen_clip_ids = set() # Use a set to prevent duplicate clips across all collections
-
-    # --- Phase de collecte ---
-    # Collecte tous les clips des broadcasters prioritaires
-    print("\n--- Collecte des clips des streamers prioritaires ---")
-    all_broadcaster_clips = []
-    for broadcaster_id in BROADCASTER_IDS:
-        print(f"  - Recherche de clips pour le broadcaster_id: {broadcaster_id}")
-        params = {
-            "first": num_clips_per_source,
-            "started_at": start_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
-            "ended_at": end_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
+    index = clip_index.open_clip_index()
+    clip_index.prune_clip_index(index, end_date)
+    languages = list(dict.fromkeys(profile["language"] for profile in profiles.values()))
+    watermarks = {}
+    for language in languages:
+        for (source_type, source_id), fetched_until in clip_index.get_watermarks(index, language).items():
+            watermarks[(source_type, source_id, language)] = fetched_until
+    watermark_overlap = timedelta(hours=WATERMARK_OVERLAP_HOURS)
+
+    def build_params(source, full_window=False):
+        # Seule la tranche de temps pas encore collectée est demandée à Twitch (sauf relecture de toute la fenêtre)
+        source_type, source_id, language = source
+        window_start = start_date
+        watermark = watermarks.get(source)
+        if watermark is not None and not full_window:
+            window_start = max(start_date, watermark - watermark_overlap)
+        return {
+            "started_at": clip_index.format_helix_date(window_start),
+            "ended_at": clip_index.format_helix_date(end_date),
             "sort": "views",
-            "broadcaster_id": broadcaster_id,
-            "language": CLIP_LANGUAGE
+            source_type: source_id,
+            "language": language
         }
-        clips = fetch_clips(access_token, params, "broadcaster_id", broadcaster_id)
-        for clip in clips:
-            if clip["id"] not in seen_clip_ids:
-                all_broadcaster_clips.append(clip)
-                seen_clip_ids.add(clip["id"])
-    print(f"✅ Collecté {len(all_broadcaster_clips)} clips uniques de streamers prioritaires.")
-
-    # Collecte tous les clips des jeux (excluant ceux déjà vus des broadcasters)
-    print("\n--- Collecte des clips des jeux spécifiés ---")
-    all_game_clips = []
-    for game_id in GAME_IDS:
-        print(f"  - Recherche de clips pour le game_id: {game_id}")
-        params = {
-            "first": num_clips_per_source,
-            "started_at": start_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
-            "ended_at": end_date.strftime('%Y-%m-%dT%H:%M:%SZ'),
-            "sort": "views",
-            "game_id": game_id,
-            "language": CLIP_LANGUAGE
-        }
-        clips = fetch_clips(access_token, params, "game_id", game_id)
-        for clip in clips:
-            if clip["id"] not in seen_clip_ids: # Important: avoid duplicates from priority broadcasters
-                all_game_clips.append(clip)
-                seen_clip_ids.add(clip["id"])
-    print(f"✅ Collecté {len(all_game_clips)} clips uniques des jeux spécifiés (hors clips déjà inclus).")
-
-    # --- Logique de sélection finale basée sur l'option ---
-    final_clips_for_compilation = []
-    current_duration_sum = 0.0
-    clips_added_per_broadcaster = {} # Nouveau dictionnaire pour suivre le nombre de clips ajoutés par streamer
-
-    if PRIORITIZE_BROADCASTERS_STRICTLY:
-        print(f"\nMode de sélection: PRIORITAIRE (streamers d'abord). Atteindre {MIN_VIDEO_DURATION_SECONDS}s.")
-        # 1. Trier et ajouter les clips des streamers prioritaires
-        sorted_priority_clips = sorted(all_broadcaster_clips, key=lambda x: x.get('viewer_count', 0), reverse=True)
-        for clip in sorted_priority_clips:
-            broadcaster_id = clip.get('broadcaster_id')
-            
-            # Vérifie si la limite pour ce streamer est atteinte
-            if clips_added_per_broadcaster.get(broadcaster_id, 0) >= MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION:
-                print(f"  [PRIO] Ignoré : Limite de clips ({MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION}) atteinte pour {clip.get('broadcaster_name', 'N/A')}")
-                continue # Passe au clip suivant
-
-            clip_duration = float(clip.get('duration', 0.0))
-            if clip_duration > 0:
-                final_clips_for_compilation.append(clip)
-                current_duration_sum += clip_duration
-                # Incrémente le compteur de clips pour ce streamer
-                clips_added_per_broadcaster[broadcaster_id] = clips_added_per_broadcaster.get(broadcaster_id, 0) + 1 
-                
-                print(f"  [PRIO] Ajouté : '{clip.get('title', 'N/A')}' par {clip.get('broadcaster_name', 'N/A')} ({clip_duration:.1f}s, Vues: {clip.get('viewer_count', 0)}). Durée cumulée: {current_duration_sum:.1f}s. Clips de ce streamer: {clips_added_per_broadcaster[broadcaster_id]}/{MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION}")
-                
-                if current_duration_sum >= MIN_VIDEO_DURATION_SECONDS and len(final_clips_for_compilation) >= 3:
-                    print(f"  ✅ Durée minimale ({MIN_VIDEO_DURATION_SECONDS}s) atteinte avec {len(final_clips_for_compilation)} clips prioritaires.")
-                    break # Stop adding priority clips
-
-        # 2. Si la durée n'est pas atteinte, compléter avec les clips de jeux
-        if current_duration_sum < MIN_VIDEO_DURATION_SECONDS:
-            print(f"  ⚠️ Durée minimale pas encore atteinte ({current_duration_sum:.1f}s). Ajout de clips des jeux pour compléter.")
-            sorted_game_clips = sorted(all_game_clips, key=lambda x: x.get('viewer_count', 0), reverse=True)
-            for clip in sorted_game_clips:
-                # Double-check if already added (should be covered by seen_clip_ids, but safety)
-                if clip["id"] in [c["id"] for c in final_clips_for_compilation]:
-                    continue
-                
-                broadcaster_id = clip.get('broadcaster_id')
-
-                # Applique aussi la limite aux clips de jeux pour éviter qu'un streamer dominent trop la fin
-                if clips_added_per_broadcaster.get(broadcaster_id, 0) >= MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION:
-                    print(f"  [JEUX] Ignoré : Limite de clips ({MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION}) atteinte pour {clip.get('broadcaster_name', 'N/A')}")
-                    continue # Passe au clip suivant
-
-                clip_duration = float(clip.get('duration', 0.0))
-                if clip_duration > 0:
-                    final_clips_for_compilation.append(clip)
-                    current_duration_sum += clip_duration
-                    clips_added_per_broadcaster[broadcaster_id] = clips_added_per_broadcaster.get(broadcaster_id, 0) + 1 
-                    print(f"  [JEUX] Ajouté : '{clip.get('title', 'N/A')}' par {clip.get('broadcaster_name', 'N/A')} ({clip_duration:.1f}s, Vues: {clip.get('viewer_count', 0)}). Durée cumulée: {current_duration_sum:.1f}s. Clips de ce streamer: {clips_added_per_broadcaster[broadcaster_id]}/{MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION}")
-                    
-                    if current_duration_sum >= MIN_VIDEO_DURATION_SECONDS and len(final_clips_for_compilation) >= 3:
-                        print(f"  ✅ Durée minimale ({MIN_VIDEO_DURATION_SECONDS}s) atteinte avec {len(final_clips_for_compilation)} clips (mix prioritaires/jeux).")
-                        break # Stop adding game clips
-
-    else: # Logique "comme avant": tout trier par vues
-        print(f"\nMode de sélection: CLASSIQUE (tous les clips triés par vues). Atteindre {MIN_VIDEO_DURATION_SECONDS}s.")
-        all_collected_clips = []
-        all_collected_clips.extend(all_broadcaster_clips)
-        all_collected_clips.extend(all_game_clips) # game_clips should not contain duplicates already in broadcaster_clips due to seen_clip_ids
-
-        # Filtrer par langue une dernière fois (au cas où l'API renverrait des clips hors langue)
-        filtered_clips_by_language = [clip for clip in all_collected_clips if clip.get('language') == CLIP_LANGUAGE]
-        sorted_clips_by_views = sorted(filtered_clips_by_language, key=lambda x: x.get('viewer_count', 0), reverse=True)
-
-        for clip in sorted_clips_by_views:
-            broadcaster_id = clip.get('broadcaster_id')
-
-            # Vérifie si la limite pour ce streamer est atteinte, même en mode classique
-            if clips_added_per_broadcaster.get(broadcaster_id, 0) >= MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION:
-                print(f"  [GLOBAL] Ignoré : Limite de clips ({MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION}) atteinte pour {clip.get('broadcaster_name', 'N/A')}")
-                continue # Passe au clip suivant
-
-            clip_duration = float(clip.get('duration', 0.0))
-            if clip_duration > 0:
-                final_clips_for_compilation.append(clip)
-                current_duration_sum += clip_duration
-                clips_added_per_broadcaster[broadcaster_id] = clips_added_per_broadcaster.get(broadcaster_id, 0) + 1 
-                print(f"  [GLOBAL] Ajouté : '{clip.get('title', 'N/A')}' par {clip.get('broadcaster_name', 'N/A')} ({clip_duration:.1f}s, Vues: {clip.get('viewer_count', 0)}). Durée cumulée: {current_duration_sum:.1f}s. Clips de ce streamer: {clips_added_per_broadcaster[broadcaster_id]}/{MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION}")
-                
-                if current_duration_sum >= MIN_VIDEO_DURATION_SECONDS and len(final_clips_for_compilation) >= 3:
-                    print(f"  ✅ Durée minimale ({MIN_VIDEO_DURATION_SECONDS}s) atteinte avec {len(final_clips_for_compilation)} clips.")
-                    break
-
-
-    # Final check and logging
-    if current_duration_sum < MIN_VIDEO_DURATION_SECONDS and final_clips_for_compilation:
-        print(f"⚠️ ATTENTION: Impossible d'atteindre la durée minimale de {MIN_VIDEO_DURATION_SECONDS} secondes ({MIN_VIDEO_DURATION_SECONDS / 60:.2f} minutes) avec les clips disponibles. Durée finale: {current_duration_sum:.1f}s")
-            
-    if not final_clips_for_compilation:
-        print("⚠️ Aucun clip viable n'a été sélectionné pour la compilation (peut-être tous avec durée 0, ou aucun trouvé). Le fichier top_clips.json sera vide.")
-        sys.exit(0)
-
-    # The final list of clips to save
-    final_clips = final_clips_for_compilation
 
-    # --- DÉBUGGAGE : Affiche les clips finaux avant de les écrire dans le JSON ---
-    print("\n--- CLIPS FINAUX SÉLECTIONNÉS POUR SAUVEGARDE ---")
-    if final_clips:
+    # --- Seuils d'arrêt de la pagination, par profil ---
+    # En mode prioritaire, les clips de streamers sont retenus avant ceux des jeux quelles que soient
+    # leurs vues : chaque groupe a donc son propre seuil. En mode classique, le seuil est commun.
+    # Les seuils partent des clips déjà présents dans l'index.
+    cutoffs_per_source = {}
+    best_indexed_views = {} # source -> vues du meilleur clip indexé
+    for profile in profiles.values():
+        if profile["strategy"] == "priority":
+            cutoffs = {"broadcaster_id": ViewCountCutoff(), "game_id": ViewCountCutoff()}
+        else:
+            shared_cutoff = ViewCountCutoff()
+            cutoffs = {"broadcaster_id": shared_cutoff, "game_id": shared_cutoff}
+        indexed_broadcaster_clips, indexed_game_clips = clip_index.query_candidate_clips(
+            index, start_date, profile["language"], profile["broadcaster_ids"], profile["game_ids"])
+        cutoffs["broadcaster_id"].offer(indexed_broadcaster_clips)
+        cutoffs["game_id"].offer(indexed_game_clips)
+        for clip in indexed_broadcaster_clips + indexed_game_clips:
+            for source_type in ("broadcaster_id", "game_id"):
+                source = (source_type, clip[source_type], profile["language"])
+                best_indexed_views[source] = max(best_indexed_views.get(source, 0), clip["viewer_count"])
+        for source_type, key in (("broadcaster_id", "broadcaster_ids"), ("game_id", "game_ids")):
+            for source_id in profile[key]:
+                cutoffs_per_source.setdefault((source_type, source_id, profile["language"]), []).append(cutoffs[source_type])
+
+    # --- Phase de collecte (parallèle), sur l'union des sources de tous les profils ---
+    sources = list(cutoffs_per_source)
+    cutoffs = {source: cutoffs[0] if len(cutoffs) == 1 else CombinedCutoff(cutoffs) for source, cutoffs in cutoffs_per_source.items()}
+    incremental_sources = sum(1 for source in sources if source in watermarks)
+    # Relecture du haut du classement de toute la fenêtre pour les sources proches du seuil (vues à jour),
+    # collectée en même temps que les nouvelles tranches
+    refresh_group = end_date.toordinal() % REFRESH_GROUPS
+    refreshed_sources = [source for source in sources if source in watermarks
+                         and zlib.crc32("/".join(source).encode("utf-8")) % REFRESH_GROUPS == refresh_group
+                         and best_indexed_views.get(source, 0) >= cutoffs[source].value() * REFRESH_CUTOFF_RATIO]
+    print(f"\n--- Collecte parallèle des clips de {len(sources)} sources ({MAX_FETCH_WORKERS} requêtes simultanées, "
+          f"{incremental_sources} en incrémental dont {len(refreshed_sources)} relues sur toute la fenêtre) ---")
+    results = fetch_all_sources([(source, build_params(source), num_clips_per_source) for source in sources]
+                                + [(source, build_params(source, full_window=True), REFRESH_CLIPS_PER_SOURCE) for source in refreshed_sources],
+                                cutoffs)
+    results_per_source, refresh_results = results[:len(sources)], results[len(sources):]
+
+    # --- Mise à jour de l'index ---
+    # La déduplication se fait par ID de clip dans l'index ; le watermark d'une source n'avance
+    # que si toutes ses pages de la nouvelle tranche ont été récupérées sans erreur.
+    new_clip_ids = set()
+    with index:
+        for clips, _ in refresh_results:
+            clip_index.upsert_clips(index, clips, end_date)
+            new_clip_ids.update(clip["id"] for clip in clips)
+        for (source_type, source_id, language), (clips, complete) in zip(sources, results_per_source):
+            clip_index.upsert_clips(index, clips, end_date)
+            new_clip_ids.update(clip["id"] for clip in clips)
+            if complete:
+                clip_index.set_watermark(index, source_type, source_id, language, end_date)
+    print(f"✅ {len(new_clip_ids)} clips uniques collectés et indexés.")
+
+    # --- Les candidats de chaque profil viennent de l'index (clips non encore publiés) ---
+    candidates = {}
+    for name, profile in profiles.items():
+        candidates[name] = clip_index.query_candidate_clips(
+            index, start_date, profile["language"], profile["broadcaster_ids"], profile["game_ids"])
+        print(f"✅ [{name}] {len(candidates[name][0])} clips candidats de streamers prioritaires, {len(candidates[name][1])} clips candidats des jeux (hors streamers prioritaires).")
+    index.close()
+    add_metrics(api_requests=api_stats["requests"], bytes_read=api_stats["bytes_read"], clips_indexed=len(new_clip_ids),
+                split_windows=fetch_stats["split_windows"])
+    return candidates
+
+def get_top_clips(num_clips_per_source=50, days_ago=3, profile_names=None):
+    """
+    Fetches and prioritizes clips based on configured parameters, with a limit per broadcaster.
+    Une seule collecte alimente tous les profils ; chaque profil a son propre manifeste.
+    """
+    candidates = collect_candidate_clips(num_clips_per_source, days_ago, profile_names)
+
+    selections = {}
+    for name, (all_broadcaster_clips, all_game_clips) in candidates.items():
+        print(f"\n=== Profil {name} ===")
+        # --- Sélection finale (moteur de sélection unique, stratégie configurable) ---
+        final_clips_for_compilation, current_duration_sum = select_clips(
+            all_broadcaster_clips, all_game_clips, get_profile(name)["strategy"],
+            MIN_VIDEO_DURATION_SECONDS, MAX_CLIPS_PER_BROADCASTER_IN_FINAL_COMPILATION,
+            MAX_TOTAL_CLIPS, MAX_VIDEO_DURATION_SECONDS)
+
+        # Final check and logging
+        if current_duration_sum < MIN_VIDEO_DURATION_SECONDS and final_clips_for_compilation:
+            print(f"⚠️ ATTENTION: Impossible d'atteindre la durée minimale de {MIN_VIDEO_DURATION_SECONDS} secondes ({MIN_VIDEO_DURATION_SECONDS / 60:.2f} minutes) avec les clips disponibles. Durée finale: {current_duration_sum:.1f}s")
+
+        output_path = manifest_path(name)
+        if not final_clips_for_compilation:
+            print(f"⚠️ Aucun clip viable n'a été sélectionné pour le profil {name} (peut-être tous avec durée 0, ou aucun trouvé). Aucun manifeste ne sera écrit.")
+            if os.path.exists(output_path):
+                os.remove(output_path) # Pas de manifeste périmé d'une exécution précédente
+            continue
+
+        # The final list of clips to save
+        final_clips = final_clips_for_compilation
+
+        # --- DÉBUGGAGE : Affiche les clips finaux avant de les écrire dans le manifeste ---
+        print("\n--- CLIPS FINAUX SÉLECTIONNÉS POUR SAUVEGARDE ---")
         for i, clip in enumerate(final_clips):
             print(f"{i+1}. Title: {clip.get('title', 'N/A')}, Broadcaster: {clip.get('broadcaster_name', 'N/A')}, Views: {clip.get('viewer_count', 0)}, Duration: {clip.get('duration', 'N/A')}s, Language: {clip.get('language', 'N/A')}, URL: {clip.get('url', 'N/A')}")
-    else:
-        print("Aucun clip à sauvegarder.")
-    print("--------------------------------------------------\n")
-            
-    with open(OUTPUT_CLIPS_JSON, "w", encoding="utf-8") as f:
-        json.dump(final_clips, f, ensure_ascii=False, indent=2)
-    
-    print(f"✅ {len(final_clips)} clips récupérés et sauvegardés dans {OUTPUT_CLIPS_JSON} pour une durée totale de {current_duration_sum:.1f} secondes.")
-    return final_clips
+        print("--------------------------------------------------\n")
+
+        # Nouveau manifeste : les étapes suivantes y ajoutent leurs résultats
+        write_manifest(final_clips, output_path)
+        print(f"✅ {len(final_clips)} clips récupérés et sauvegardés dans {output_path} pour une durée totale de {current_duration_sum:.1f} secondes.")
+        selections[name] = final_clips
+
+    add_metrics(clips_processed=sum(len(clips) for clips in selections.values()), profiles=len(selections))
+    if not selections:
+        print("⚠️ Aucun clip viable n'a été sélectionné, quel que soit le profil.")
+        sys.exit(0)
+    return selections
 
 if __name__ == "__main__":
-    token = get_twitch_access_token()
-    if token:
-        get_top_clips(token, num_clips_per_source=50)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Collecte les clips Twitch et sélectionne ceux de chaque profil de compilation.")
+    parser.add_argument("--profiles", nargs="+", choices=list(COMPILATION_PROFILES), help=f"Profils à construire (par défaut : {', '.join(ENABLED_PROFILES)}).")
+    args = parser.parse_args()
+
+    # Première étape du pipeline : elle ouvre un nouveau rapport d'exécution
+    with stage_report("get_top_clips", new_run=True):
+        # Vérifie les identifiants avant la collecte (le jeton est ensuite partagé via le cache)
+        token = get_twitch_access_token()
+        if token:
+            get_top_clips(num_clips_per_source=100, profile_names=args.profiles)
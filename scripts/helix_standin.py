@@ -0,0 +1,362 @@
+import os
+import sys
+import json
+import time
+import random
+import base64
+import hashlib
+import argparse
+import threading
+from array import array
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, parse_qsl, urlencode
+
+import requests
+
+# Serveur local qui imite https://api.twitch.tv/helix (clips, users, games) et l'endpoint OAuth.
+# Trois modes :
+#   - synthétique : catalogue généré de N clips (10k à 1M), avec latence, pagination et 429 injectés ;
+#   - enregistrement : relaie les requêtes (et la demande de jeton OAuth) vers Twitch et sauvegarde les réponses Helix comme fixtures ;
+#   - rejeu : sert les fixtures enregistrées, sans identifiants Twitch.
+# Les scripts l'utilisent via TWITCH_API_BASE_URL=http://127.0.0.1:<port>/helix
+# et TWITCH_AUTH_URL=http://127.0.0.1:<port>/oauth2/token.
+
+DEFAULT_PORT = 8910
+REAL_TWITCH_API_BASE_URL = "https://api.twitch.tv/helix"
+REAL_TWITCH_AUTH_URL = "https://id.twitch.tv/oauth2/token"
+
+HELIX_MAX_PAGE_SIZE = 100
+HELIX_RESULT_CAP = 1000 # Comme Helix, plus de curseur au-delà de ce nombre de résultats pour une même requête
+HELIX_DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Fenêtre de temps d'une requête : elle se décale à chaque exécution. Elle ne fait pas partie du nom de la fixture,
+# mais chaque réponse est enregistrée avec sa fenêtre relative à la session (décalages depuis le premier `ended_at`
+# reçu, c'est-à-dire la date d'exécution du client). Au rejeu, la réponse dont la fenêtre relative est la plus
+# proche (à cette tolérance près) est servie : les sous-fenêtres d'une collecte ont chacune leur fixture.
+VOLATILE_FIXTURE_PARAMS = ("started_at", "ended_at")
+FIXTURE_WINDOW_TOLERANCE_MINUTES = 30
+
+def _encode_cursor(offset):
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+def _decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        return 0
+
+class SyntheticCatalog:
+    """
+    Catalogue synthétique et déterministe de clips répartis sur des streamers et des jeux.
+    Les attributs sont stockés en tableaux compacts (`array`) pour tenir 1M de clips en mémoire ;
+    les dicts JSON ne sont construits que pour les clips réellement renvoyés.
+    """
+    def __init__(self, num_clips, broadcaster_ids, game_ids, days=7, seed=42, foreign_language_ratio=0.1):
+        self.broadcaster_ids = list(broadcaster_ids)
+        self.game_ids = list(game_ids)
+        self.end_date = datetime.now(timezone.utc)
+        self.start_timestamp = (self.end_date - timedelta(days=days)).timestamp()
+        rng = random.Random(seed)
+        window_seconds = days * 86400
+
+        self.broadcaster_index = array("I")
+        self.game_index = array("I")
+        self.view_counts = array("I")
+        self.created_offsets = array("I")
+        self.durations = array("f")
+        self.is_foreign = array("B")
+        for _ in range(num_clips):
+            self.broadcaster_index.append(rng.randrange(len(self.broadcaster_ids)))
+            self.game_index.append(rng.randrange(len(self.game_ids)))
+            self.view_counts.append(min(int(rng.paretovariate(1.2) * 10), 2**31))
+            self.created_offsets.append(rng.randrange(window_seconds))
+            self.durations.append(round(rng.uniform(5.0, 60.0), 1))
+            self.is_foreign.append(rng.random() < foreign_language_ratio)
+
+        # Index des clips par source, triés par vues décroissantes (comme `sort=views` côté Helix)
+        by_views = sorted(range(num_clips), key=self.view_counts.__getitem__, reverse=True)
+        self.clips_by_broadcaster = {broadcaster_id: array("I") for broadcaster_id in self.broadcaster_ids}
+        self.clips_by_game = {game_id: array("I") for game_id in self.game_ids}
+        for clip_index in by_views:
+            self.clips_by_broadcaster[self.broadcaster_ids[self.broadcaster_index[clip_index]]].append(clip_index)
+            self.clips_by_game[self.game_ids[self.game_index[clip_index]]].append(clip_index)
+
+        self._query_cache = {}
+        self._query_cache_lock = threading.Lock()
+
+    def clip_to_json(self, clip_index):
+        broadcaster_id = self.broadcaster_ids[self.broadcaster_index[clip_index]]
+        game_id = self.game_ids[self.game_index[clip_index]]
+        created_at = datetime.fromtimestamp(self.start_timestamp + self.created_offsets[clip_index], timezone.utc)
+        return {
+            "id": f"SyntheticClip{clip_index}",
+            "url": f"https://clips.twitch.tv/SyntheticClip{clip_index}",
+            "embed_url": f"https://clips.twitch.tv/embed?clip=SyntheticClip{clip_index}",
+            "broadcaster_id": broadcaster_id,
+            "broadcaster_name": f"streamer_{broadcaster_id}",
+            "creator_id": "0",
+            "creator_name": "standin",
+            "video_id": "",
+            "game_id": game_id,
+            "game_name": f"Jeu {game_id}",
+            "language": "en" if self.is_foreign[clip_index] else "fr",
+            "title": f"Clip synthétique n°{clip_index}",
+            "view_count": self.view_counts[clip_index],
+            "created_at": created_at.strftime(HELIX_DATE_FORMAT),
+            "thumbnail_url": f"https://clips-media-assets2.twitch.tv/SyntheticClip{clip_index}-preview-480x272.jpg",
+            "duration": round(self.durations[clip_index], 1),
+        }
+
+    def _matching_clips(self, source_type, source_id, started_at, ended_at, language):
+        """Clips d'une source dans la fenêtre demandée (mis en cache pour paginer sans tout refiltrer)."""
+        key = (source_type, source_id, started_at, ended_at, language)
+        with self._query_cache_lock:
+            if key in self._query_cache:
+                return self._query_cache[key]
+        clips = (self.clips_by_broadcaster if source_type == "broadcaster_id" else self.clips_by_game).get(source_id, array("I"))
+        start_offset = (datetime.strptime(started_at, HELIX_DATE_FORMAT).replace(tzinfo=timezone.utc).timestamp() - self.start_timestamp) if started_at else float("-inf")
+        end_offset = (datetime.strptime(ended_at, HELIX_DATE_FORMAT).replace(tzinfo=timezone.utc).timestamp() - self.start_timestamp) if ended_at else float("inf")
+        want_foreign = language is not None and language != "fr"
+        matching = array("I", (
+            clip_index for clip_index in clips
+            if start_offset <= self.created_offsets[clip_index] <= end_offset
+            and (language is None or bool(self.is_foreign[clip_index]) == want_foreign)
+        ))
+        with self._query_cache_lock:
+            self._query_cache[key] = matching
+        return matching
+
+    def query_clips(self, params):
+        source_type = "broadcaster_id" if "broadcaster_id" in params else "game_id"
+        matching = self._matching_clips(
+            source_type, params.get(source_type), params.get("started_at"), params.get("ended_at"), params.get("language"))
+        page_size = min(int(params.get("first", 20)), HELIX_MAX_PAGE_SIZE)
+        offset = _decode_cursor(params["after"]) if params.get("after") else 0
+        available = min(len(matching), HELIX_RESULT_CAP)
+        page = matching[offset:min(offset + page_size, available)]
+        body = {"data": [self.clip_to_json(clip_index) for clip_index in page], "pagination": {}}
+        if offset + page_size < available:
+            body["pagination"]["cursor"] = _encode_cursor(offset + page_size)
+        return body
+
+class FixtureStore:
+    """
+    Fixtures JSON indexées par endpoint et paramètres (hors fenêtre de temps) ; un fichier contient les réponses
+    de chaque fenêtre de temps relative enregistrée (voir VOLATILE_FIXTURE_PARAMS).
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.anchor = None # Premier `ended_at` reçu pendant la session
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, path, query_pairs):
+        stable_pairs = sorted((key, value) for key, value in query_pairs if key not in VOLATILE_FIXTURE_PARAMS)
+        digest = hashlib.sha1(f"{path}?{urlencode(stable_pairs)}".encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{path.strip('/').replace('/', '_')}_{digest}.json")
+
+    def _window(self, query_pairs):
+        """Fenêtre de temps de la requête en secondes depuis l'ancre de la session, ou None si elle n'en a pas."""
+        params = dict(query_pairs)
+        try:
+            bounds = [datetime.strptime(params[key], HELIX_DATE_FORMAT).replace(tzinfo=timezone.utc) for key in VOLATILE_FIXTURE_PARAMS]
+        except (KeyError, ValueError):
+            return None
+        with self._lock:
+            if self.anchor is None:
+                self.anchor = bounds[1]
+        return [(bound - self.anchor).total_seconds() for bound in bounds]
+
+    def _read(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except OSError:
+            return []
+        return entries if isinstance(entries, list) else [entries] # Ancien format : une seule réponse, sans fenêtre
+
+    def load(self, path, query_pairs):
+        window = self._window(query_pairs)
+        with self._lock:
+            entries = self._read(self._path(path, query_pairs))
+        if window is None or not entries:
+            return entries[0] if entries else None
+        def distance(entry):
+            if entry.get("window") is None:
+                return 0.0
+            return max(abs(bound - recorded) for bound, recorded in zip(window, entry["window"]))
+        best = min(entries, key=distance)
+        return best if distance(best) <= FIXTURE_WINDOW_TOLERANCE_MINUTES * 60 else None
+
+    def save(self, path, query_pairs, status, body):
+        window = self._window(query_pairs)
+        fixture_path = self._path(path, query_pairs)
+        with self._lock:
+            entries = [entry for entry in self._read(fixture_path) if entry.get("window") != window]
+            entries.append({"window": window, "status": status, "body": body})
+            with open(fixture_path, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+
+class StandinStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.rate_limited = 0
+
+class HelixStandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, catalog=None, fixtures=None, record=False, latency_ms=0, rate_limit_every=0):
+        super().__init__(address, HelixStandinHandler)
+        self.catalog = catalog
+        self.fixtures = fixtures
+        self.record = record
+        self.latency_ms = latency_ms
+        self.rate_limit_every = rate_limit_every
+        self.stats = StandinStats()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+class HelixStandinHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass # Pas de log par requête (le benchmark en envoie des milliers)
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _before_request(self):
+        """Compte la requête, applique la latence simulée ; retourne False si un 429 a été envoyé."""
+        server = self.server
+        with server.stats.lock:
+            server.stats.requests += 1
+            request_number = server.stats.requests
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000)
+        if server.rate_limit_every and request_number % server.rate_limit_every == 0:
+            with server.stats.lock:
+                server.stats.rate_limited += 1
+            self._send_json(429, {"error": "Too Many Requests", "status": 429, "message": "standin rate limit"},
+                            {"Ratelimit-Limit": "800", "Ratelimit-Remaining": "0", "Ratelimit-Reset": str(int(time.time()) + 1)})
+            return False
+        return True
+
+    def do_POST(self):
+        if urlsplit(self.path).path != "/oauth2/token":
+            self._send_json(404, {"error": "Not Found", "status": 404})
+            return
+        if not self._before_request():
+            return
+        # Les jetons ne sont jamais enregistrés dans les fixtures : le rejeu sert un jeton factice.
+        if not self.server.record:
+            self._send_json(200, {"access_token": "standin-token", "expires_in": 3600, "token_type": "bearer"})
+            return
+        # Enregistrement : les identifiants du client sont relayés à Twitch, qui délivre le vrai jeton
+        # transmis ensuite avec chaque requête Helix relayée.
+        form = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8")
+        response = requests.post(REAL_TWITCH_AUTH_URL, data=dict(parse_qsl(form)))
+        self._send_json(response.status_code, response.json())
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query_pairs = [(key, value) for key, values in parse_qs(url.query).items() for value in values]
+        if not url.path.startswith("/helix/"):
+            self._send_json(404, {"error": "Not Found", "status": 404})
+            return
+        if not self._before_request():
+            return
+
+        server = self.server
+        if server.record:
+            response = requests.get(
+                REAL_TWITCH_API_BASE_URL + url.path[len("/helix"):], params=query_pairs,
+                headers={key: self.headers[key] for key in ("Client-ID", "Authorization") if self.headers.get(key)})
+            body = response.json()
+            server.fixtures.save(url.path, query_pairs, response.status_code, body)
+            self._send_json(response.status_code, body)
+            return
+        if server.fixtures is not None:
+            fixture = server.fixtures.load(url.path, query_pairs)
+            if fixture is None:
+                self._send_json(404, {"error": "Not Found", "status": 404, "message": "no recorded fixture"})
+            else:
+                self._send_json(fixture["status"], fixture["body"])
+            return
+
+        params = {key: value for key, value in query_pairs}
+        catalog = server.catalog
+        if url.path == "/helix/clips":
+            self._send_json(200, catalog.query_clips(params))
+        elif url.path == "/helix/users":
+            ids = [value for key, value in query_pairs if key == "id"]
+            logins = [value for key, value in query_pairs if key == "login"]
+            users = [{"id": user_id, "login": f"streamer_{user_id}"} for user_id in ids if user_id in catalog.clips_by_broadcaster]
+            users += [{"id": login.split("_", 1)[1], "login": login} for login in logins
+                      if login.startswith("streamer_") and login.split("_", 1)[1] in catalog.clips_by_broadcaster]
+            self._send_json(200, {"data": users})
+        elif url.path == "/helix/games":
+            ids = [value for key, value in query_pairs if key == "id"]
+            names = [value for key, value in query_pairs if key == "name"]
+            games = [{"id": game_id, "name": f"Jeu {game_id}"} for game_id in ids if game_id in catalog.clips_by_game]
+            games += [{"id": name.split(" ", 1)[1], "name": name} for name in names
+                      if name.startswith("Jeu ") and name.split(" ", 1)[1] in catalog.clips_by_game]
+            self._send_json(200, {"data": games})
+        else:
+            self._send_json(404, {"error": "Not Found", "status": 404})
+
+def start_standin_server(port=0, **server_options):
+    """Démarre le serveur dans un thread (port 0 = port libre) et le retourne."""
+    server = HelixStandinServer(("127.0.0.1", port), **server_options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serveur local imitant l'API Helix de Twitch (clips, users, games, OAuth).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--clips", type=int, default=10_000, help="Taille du catalogue synthétique.")
+    parser.add_argument("--days", type=int, default=7, help="Période couverte par le catalogue synthétique.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Latence ajoutée à chaque requête.")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Renvoie un 429 toutes les N requêtes (0 = jamais).")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", metavar="DOSSIER", help="Relaie vers Twitch et enregistre les réponses dans ce dossier.")
+    mode.add_argument("--replay", metavar="DOSSIER", help="Sert les réponses enregistrées dans ce dossier.")
+    args = parser.parse_args()
+
+    catalog = None
+    fixtures = None
+    if args.record or args.replay:
+        fixtures = FixtureStore(args.record or args.replay)
+    else:
+        # get_top_clips exige des identifiants à l'import ; le serveur local n'en a pas besoin.
+        os.environ.setdefault("TWITCH_CLIENT_ID", "standin")
+        os.environ.setdefault("TWITCH_CLIENT_SECRET", "standin")
+        from get_top_clips import BROADCASTER_IDS, GAME_IDS
+        print(f"🧪 Génération d'un catalogue synthétique de {args.clips} clips...")
+        catalog = SyntheticCatalog(args.clips, dict.fromkeys(BROADCASTER_IDS), dict.fromkeys(GAME_IDS), days=args.days, seed=args.seed)
+
+    server = HelixStandinServer(("127.0.0.1", args.port), catalog=catalog, fixtures=fixtures, record=bool(args.record),
+                                latency_ms=args.latency_ms, rate_limit_every=args.rate_limit_every)
+    print(f"✅ Serveur Helix local prêt sur {server.base_url}")
+    print(f"   export TWITCH_API_BASE_URL={server.base_url}/helix")
+    print(f"   export TWITCH_AUTH_URL={server.base_url}/oauth2/token")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nArrêt du serveur.")
+        sys.exit(0)
@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import time
+import argparse
+import contextlib
+from datetime import datetime, timezone
+
+# Rapport d'exécution du pipeline : chaque script y ajoute un enregistrement (durée, CPU, octets lus/écrits,
+# clips traités, vitesse d'encodage, débit d'upload...). Le rapport de l'exécution courante est dans data/,
+# et l'historique des exécutions (une ligne JSON par exécution) est conservé dans .cache/ pour comparer les jours.
+RUN_REPORT_PATH = os.path.join("data", "run_report.json")
+RUN_HISTORY_PATH = os.path.join(".cache", "run_history.jsonl")
+RUN_HISTORY_LIMIT = 120 # Exécutions conservées dans l'historique
+
+# Étapes dans l'ordre du pipeline (pour l'affichage de l'historique)
+PIPELINE_STAGES = ["get_top_clips", "download_clips", "compile_video", "generate_metadata", "generate_thumbnail", "upload_youtube"]
+
+_current_metrics = None
+
+def _write_json_atomic(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+def load_run_report(new_run=False):
+    """
+    Rapport de l'exécution courante. Un nouveau rapport est créé s'il n'en existe pas, s'il vient d'une autre
+    exécution GitHub Actions, ou si `new_run` (première étape du pipeline).
+    """
+    run_id = os.getenv("GITHUB_RUN_ID")
+    try:
+        with open(RUN_REPORT_PATH, "r", encoding="utf-8") as f:
+            report = json.load(f)
+        if report.get("run_id") == run_id or (run_id is None and not new_run):
+            return report
+    except (OSError, ValueError):
+        pass
+    now = datetime.now(timezone.utc)
+    return {"run_id": run_id or now.strftime("%Y%m%dT%H%M%SZ"), "started_at": now.isoformat(timespec="seconds"), "stages": {}}
+
+def _save_to_history(report):
+    """Remplace (ou ajoute) l'exécution dans l'historique, limité aux RUN_HISTORY_LIMIT dernières."""
+    runs = load_run_history()
+    runs = [run for run in runs if run.get("run_id") != report["run_id"]] + [report]
+    lines = [json.dumps(run, ensure_ascii=False, separators=(",", ":")) for run in runs[-RUN_HISTORY_LIMIT:]]
+    _write_json_atomic(RUN_HISTORY_PATH, "\n".join(lines) + "\n")
+
+def load_run_history():
+    try:
+        with open(RUN_HISTORY_PATH, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return []
+
+def add_metrics(**metrics):
+    """Ajoute des mesures à l'étape en cours (sans effet hors de stage_report, ex: benchmarks)."""
+    if _current_metrics is not None:
+        _current_metrics.update({key: value for key, value in metrics.items() if value is not None})
+
+def _cpu_seconds():
+    # Processus courant et processus enfants terminés (FFmpeg, ffprobe)
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+@contextlib.contextmanager
+def stage_report(stage, profile=None, new_run=False):
+    """
+    Mesure une étape du pipeline et enregistre le résultat dans le rapport d'exécution et l'historique.
+    Les scripts ajoutent leurs propres mesures avec add_metrics() pendant l'étape.
+    """
+    global _current_metrics
+    _current_metrics = metrics = {}
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    start_wall, start_cpu = time.perf_counter(), _cpu_seconds()
+    status = "ok"
+    try:
+        yield metrics
+    except SystemExit as e:
+        status = "ok" if e.code in (None, 0) else "error"
+        raise
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _current_metrics = None
+        record = {
+            "stage": stage,
+            "profile": profile,
+            "status": status,
+            "started_at": started_at,
+            "duration_seconds": round(time.perf_counter() - start_wall, 3),
+            "cpu_seconds": round(_cpu_seconds() - start_cpu, 3),
+            **metrics,
+        }
+        key = stage if profile in (None, "default") else f"{stage}:{profile}"
+        try:
+            report = load_run_report(new_run)
+            report["stages"][key] = record
+            _write_json_atomic(RUN_REPORT_PATH, json.dumps(report, ensure_ascii=False, indent=2))
+            _save_to_history(report)
+        except OSError as e:
+            print(f"⚠️ Impossible d'écrire le rapport d'exécution : {e}")
+        print(f"📈 [{key}] {record['duration_seconds']:.1f}s, CPU {record['cpu_seconds']:.1f}s ({status}).")
+
+def print_history(limit=14):
+    """Durée de chaque étape sur les dernières exécutions, pour repérer les régressions d'un jour à l'autre."""
+    runs = load_run_history()[-limit:]
+    if not runs:
+        print(f"Aucun historique dans {RUN_HISTORY_PATH}.")
+        return
+    header = f"{'exécution':<22}" + "".join(f"{stage[:14]:>15}" for stage in PIPELINE_STAGES)
+    print(header)
+    print("-" * len(header))
+    for run in runs:
+        cells = []
+        for stage in PIPELINE_STAGES:
+            record = run["stages"].get(stage)
+            cells.append(f"{record['duration_seconds']:>14.1f}s" if record else f"{'-':>15}")
+        print(f"{run.get('started_at', run['run_id'])[:19]:<22}" + "".join(cells))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Affiche l'historique des durées par étape du pipeline.")
+    parser.add_argument("--limit", type=int, default=14, help="Nombre d'exécutions affichées.")
+    parser.add_argument("--json", action="store_true", help="Affiche le rapport de l'exécution courante en JSON.")
+    args = parser.parse_args()
+    if args.json:
+        json.dump(load_run_report(), sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_history(args.limit)
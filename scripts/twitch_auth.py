@@ -0,0 +1,157 @@
+import requests
+import os
+import sys
+import json
+import time
+import threading
+
+# Twitch API credentials from GitHub Secrets
+CLIENT_ID = os.getenv("TWITCH_CLIENT_ID")
+CLIENT_SECRET = os.getenv("TWITCH_CLIENT_SECRET")
+
+# Surchargeables (ex: serveur local helix_standin.py pour les tests et benchmarks)
+TWITCH_AUTH_URL = os.getenv("TWITCH_AUTH_URL", "https://id.twitch.tv/oauth2/token")
+TWITCH_API_BASE_URL = os.getenv("TWITCH_API_BASE_URL", "https://api.twitch.tv/helix")
+
+# Jeton d'application mis en cache sur disque, partagé par tous les scripts (et tous les workers).
+TOKEN_CACHE_PATH = os.path.join(".cache", "twitch_app_token.json")
+
+# Le jeton est renouvelé un peu avant son expiration réelle.
+TOKEN_EXPIRY_MARGIN_SECONDS = 300
+
+# Nombre de nouvelles tentatives après une réponse 429 (limite de requêtes Helix atteinte),
+# et attente maximale avant chaque tentative.
+MAX_RATE_LIMIT_RETRIES = 3
+MAX_RATE_LIMIT_WAIT_SECONDS = 30
+
+_token_lock = threading.Lock()
+_cached_token = None # {"access_token": ..., "expires_at": ...}
+
+# Requêtes Helix effectuées et octets reçus par ce processus (rapport d'exécution)
+_api_stats_lock = threading.Lock()
+api_stats = {"requests": 0, "bytes_read": 0}
+
+def _is_token_valid(token_data):
+    return (
+        token_data is not None
+        and token_data.get("client_id") == CLIENT_ID
+        and token_data.get("auth_url", TWITCH_AUTH_URL) == TWITCH_AUTH_URL
+        and token_data.get("expires_at", 0) - TOKEN_EXPIRY_MARGIN_SECONDS > time.time()
+    )
+
+def _load_token_from_disk():
+    """Charge le jeton mis en cache sur disque, ou None s'il est absent, illisible ou expiré."""
+    try:
+        with open(TOKEN_CACHE_PATH, "r", encoding="utf-8") as f:
+            token_data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return token_data if _is_token_valid(token_data) else None
+
+def _save_token_to_disk(token_data):
+    """Écrit le jeton de façon atomique, lisible uniquement par l'utilisateur courant."""
+    os.makedirs(os.path.dirname(TOKEN_CACHE_PATH), exist_ok=True)
+    temp_path = f"{TOKEN_CACHE_PATH}.tmp"
+    try:
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(token_data, f)
+        os.replace(temp_path, TOKEN_CACHE_PATH)
+    except OSError as e:
+        print(f"⚠️ Impossible de mettre en cache le jeton Twitch : {e}")
+
+def _request_new_token():
+    print("🔑 Récupération d'un nouveau jeton d'accès Twitch...")
+    payload = {
+        "client_id": CLIENT_ID,
+        "client_secret": CLIENT_SECRET,
+        "grant_type": "client_credentials"
+    }
+    try:
+        response = requests.post(TWITCH_AUTH_URL, data=payload)
+        response.raise_for_status()
+        token_data = response.json()
+        print("✅ Jeton d'accès Twitch récupéré.")
+        return {
+            "client_id": CLIENT_ID,
+            "auth_url": TWITCH_AUTH_URL,
+            "access_token": token_data["access_token"],
+            "expires_at": time.time() + token_data.get("expires_in", 0)
+        }
+    except requests.exceptions.RequestException as e:
+        print(f"❌ Erreur lors de la récupération du jeton d'accès Twitch : {e}")
+        sys.exit(1)
+
+def get_twitch_access_token(force_refresh=False):
+    """
+    Retourne un jeton d'application Twitch valide.
+    Le jeton est réutilisé (mémoire puis disque) jusqu'à peu avant son expiration.
+    """
+    global _cached_token
+    with _token_lock:
+        if not force_refresh:
+            if _is_token_valid(_cached_token):
+                return _cached_token["access_token"]
+            _cached_token = _load_token_from_disk()
+            if _cached_token:
+                print("✅ Jeton d'accès Twitch réutilisé depuis le cache.")
+                return _cached_token["access_token"]
+        _cached_token = _request_new_token()
+        _save_token_to_disk(_cached_token)
+        return _cached_token["access_token"]
+
+def invalidate_twitch_access_token(stale_token):
+    """Oublie le jeton donné (révoqué ou expiré côté Twitch), sauf s'il a déjà été remplacé."""
+    global _cached_token
+    with _token_lock:
+        if _cached_token and _cached_token["access_token"] != stale_token:
+            return # Un autre worker a déjà renouvelé le jeton
+        _cached_token = None
+        try:
+            os.remove(TOKEN_CACHE_PATH)
+        except OSError:
+            pass
+
+def get_twitch_headers(access_token):
+    return {
+        "Client-ID": CLIENT_ID,
+        "Authorization": f"Bearer {access_token}"
+    }
+
+def twitch_api_get(url, params, session=None):
+    """
+    Effectue un GET sur l'API Helix avec le jeton partagé.
+    En cas de 401 (jeton révoqué ou expiré), le jeton est renouvelé et la requête rejouée une fois.
+    En cas de 429, la requête est rejouée après la réinitialisation indiquée par `Ratelimit-Reset`.
+    """
+    http = session or requests
+    access_token = get_twitch_access_token()
+    response = _counted_get(http, url, access_token, params)
+    if response.status_code == 401:
+        print("⚠️ Jeton Twitch refusé (401). Renouvellement du jeton...")
+        invalidate_twitch_access_token(access_token)
+        access_token = get_twitch_access_token()
+        response = _counted_get(http, url, access_token, params)
+    for attempt in range(MAX_RATE_LIMIT_RETRIES):
+        if response.status_code != 429:
+            break
+        wait_seconds = get_rate_limit_wait(response, attempt)
+        print(f"⚠️ Limite de requêtes Twitch atteinte (429). Nouvelle tentative dans {wait_seconds:.1f}s...")
+        time.sleep(wait_seconds)
+        response = _counted_get(http, url, access_token, params)
+    return response
+
+def _counted_get(http, url, access_token, params):
+    response = http.get(url, headers=get_twitch_headers(access_token), params=params)
+    with _api_stats_lock:
+        api_stats["requests"] += 1
+        api_stats["bytes_read"] += len(response.content)
+    return response
+
+def get_rate_limit_wait(response, attempt):
+    """Délai avant de rejouer une requête 429 : jusqu'à `Ratelimit-Reset` (epoch), sinon backoff exponentiel."""
+    try:
+        wait_seconds = float(response.headers["Ratelimit-Reset"]) - time.time()
+    except (KeyError, TypeError, ValueError):
+        wait_seconds = 2 ** attempt
+    return min(max(wait_seconds, 0.1), MAX_RATE_LIMIT_WAIT_SECONDS)
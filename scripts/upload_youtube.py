@@ -4,6 +4,8 @@ import json
 import io
 import httplib2
 import sys
+import time
+import argparse
 import re # Importation ajoutée pour les expressions régulières
 from datetime import datetime # Importation ajoutée pour la date dans le titre
 
@@ -12,6 +14,10 @@ from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaFileUpload
 
+from clip_index import mark_clips_published
+from run_report import add_metrics, stage_report
+from clip_manifest import DEFAULT_PROFILE, manifest_path, profile_path, load_ready_clips
+
 # Scopes requis pour l'upload de vidéo
 SCOPES = ["https://www.googleapis.com/auth/youtube.upload"]
 
@@ -22,14 +28,29 @@ COMPILED_VIDEO_PATH = os.path.join("output", "compiled_video.mp4") # Anciennemen
 THUMBNAIL_PATH = os.path.join("data", "thumbnail.jpg")
 METADATA_JSON_PATH = os.path.join("data", "video_metadata.json") # CORRIGÉ
 
-def upload_video():
-    print("📤 Démarrage de l'upload YouTube...")
+def mark_compilation_clips_published(profile=DEFAULT_PROFILE):
+    """Marque les clips de la compilation comme publiés dans l'index local pour ne pas les réutiliser."""
+    clips_manifest_path = manifest_path(profile)
+    if not os.path.exists(clips_manifest_path):
+        return
+    clip_ids = [clip.id for clip in load_ready_clips(clips_manifest_path)]
+    try:
+        mark_clips_published(clip_ids)
+        print(f"✅ {len(clip_ids)} clips marqués comme publiés dans l'index local.")
+    except Exception as e:
+        print(f"⚠️ Impossible de marquer les clips comme publiés dans l'index local : {e}")
+
+def upload_video(profile=DEFAULT_PROFILE):
+    print(f"📤 Démarrage de l'upload YouTube (profil {profile})...")
+    compiled_video_path = profile_path(COMPILED_VIDEO_PATH, profile)
+    thumbnail_path = profile_path(THUMBNAIL_PATH, profile)
+    metadata_json_path = profile_path(METADATA_JSON_PATH, profile)
 
     # 1. Charger les métadonnées
-    if not os.path.exists(METADATA_JSON_PATH):
-        print(f"❌ Fichier de métadonnées '{METADATA_JSON_PATH}' introuvable.")
+    if not os.path.exists(metadata_json_path):
+        print(f"❌ Fichier de métadonnées '{metadata_json_path}' introuvable.")
         sys.exit(1)
-    with open(METADATA_JSON_PATH, "r", encoding="utf-8") as f:
+    with open(metadata_json_path, "r", encoding="utf-8") as f:
         metadata = json.load(f)
 
     # --- DÉBUT DES MODIFICATIONS POUR LE TITRE (SIMPLIFIÉ) ---
@@ -110,15 +131,15 @@ def upload_video():
     youtube = build("youtube", "v3", credentials=creds)
 
     # 3. Préparer la vidéo et la miniature
-    if not os.path.exists(COMPILED_VIDEO_PATH):
-        print(f"❌ Fichier vidéo compilée '{COMPILED_VIDEO_PATH}' introuvable.")
+    if not os.path.exists(compiled_video_path):
+        print(f"❌ Fichier vidéo compilée '{compiled_video_path}' introuvable.")
         sys.exit(1)
 
     thumbnail_present = False
-    if os.path.exists(THUMBNAIL_PATH):
+    if os.path.exists(thumbnail_path):
         thumbnail_present = True
     else:
-        print(f"⚠️ Fichier miniature '{THUMBNAIL_PATH}' introuvable. La vidéo sera uploadée sans miniature personnalisée.")
+        print(f"⚠️ Fichier miniature '{thumbnail_path}' introuvable. La vidéo sera uploadée sans miniature personnalisée.")
 
 
     body = {
@@ -135,7 +156,7 @@ def upload_video():
     }
 
     # Uploader la vidéo
-    media_body = MediaFileUpload(COMPILED_VIDEO_PATH, resumable=True)
+    media_body = MediaFileUpload(compiled_video_path, resumable=True)
 
     print(f"Uploading video: '{title}'...")
     insert_request = youtube.videos().insert(
@@ -145,16 +166,22 @@ def upload_video():
     )
 
     try:
+        upload_start = time.perf_counter()
         response = insert_request.execute()
+        upload_seconds = time.perf_counter() - upload_start
+        video_size = os.path.getsize(compiled_video_path)
+        add_metrics(bytes_uploaded=video_size, upload_seconds=round(upload_seconds, 3),
+                    upload_throughput_mbps=round(video_size * 8 / 1e6 / upload_seconds, 2) if upload_seconds else None)
         print(f"✅ Vidéo uploadée ! URL: https://www.youtube.com/watch?v={response['id']}") # URL de YouTube corrigée
+        mark_compilation_clips_published(profile)
         
         # Uploader la miniature
         if thumbnail_present:
-            print(f"Uploading thumbnail: '{THUMBNAIL_PATH}'...")
+            print(f"Uploading thumbnail: '{thumbnail_path}'...")
             try:
                 youtube.thumbnails().set(
                     videoId=response['id'],
-                    media_body=MediaFileUpload(THUMBNAIL_PATH)
+                    media_body=MediaFileUpload(thumbnail_path)
                 ).execute()
                 print("✅ Miniature uploadée avec succès !")
             except Exception as thumbnail_e:
@@ -170,4 +197,8 @@ def upload_video():
         return False
 
 if __name__ == "__main__":
-    upload_video()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Uploade la vidéo d'un profil sur YouTube.")
+    parser.add_argument("--profile", default=DEFAULT_PROFILE, help="Profil de compilation (voir COMPILATION_PROFILES dans get_top_clips.py).")
+    args = parser.parse_args()
+    with stage_report("upload_youtube", args.profile):
+        upload_video(args.profile)
\ No newline at end of file